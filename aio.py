@@ -0,0 +1,202 @@
+import asyncio
+import re
+from datetime import datetime
+from asgiref.wsgi import WsgiToAsgi
+from flask import current_app, jsonify
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_date, parse_etags
+from werkzeug.urls import url_decode
+from model import Venue, Artist, Show, Genre
+from queries import listed_shows, show_listing_query, show_info, show_page_query, show_page_result, detail_transition
+from cache import get_cache, remember_versions
+from loaders import show_page_args
+from api import version_queries, version_from, is_not_modified, versioned_response
+
+# Optional ASGI serving mode (see asgi.py). The read-only API routes below
+# run on the event loop against an async engine, so a worker waiting on the
+# database keeps serving other requests; every other route is handed to the
+# Flask app through asgiref's WSGI adapter.
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def init_async(app):
+    url = app.config.get('ASYNC_DATABASE_URI')
+    if not url:
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        url = url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+    # Same pool settings as the sync engine (see init_db).
+    engine = create_async_engine(url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.extensions['async_engine'] = engine
+    return engine
+
+
+async def fetch(statement):
+    # One connection per statement, so statements gathered together run
+    # concurrently on separate connections.
+    async with current_app.extensions['async_engine'].connect() as connection:
+        return (await connection.execute(statement)).all()
+
+
+async def fetch_scalar(statement):
+    rows = await fetch(statement)
+    return rows[0][0] if rows else None
+
+
+async def resource_version(tags, *criterion, timed=True):
+    queries = version_queries(tags, *criterion, timed=timed)
+    if not timed:
+        versions = await fetch(queries['versions'])
+        remember_versions(tags, versions)
+        return version_from(versions, timed=False), None
+    versions, next_show, last_passed = await asyncio.gather(
+        fetch(queries['versions']),
+        fetch_scalar(queries['next_show']),
+        fetch_scalar(queries['last_passed'])
+    )
+    # The body is then cached under these versions, without a sync query.
+    remember_versions(tags, versions)
+    return version_from(versions, next_show, last_passed), next_show
+
+
+async def entity_detail(model, entity_id):
+    # Same data as venue_detail/artist_detail: entity row, genres, upcoming
+    # and past shows are four independent queries issued at once.
+    entity = model.__tablename__
+    link = model.genres.property.secondary
+    now = datetime.today()
+    listed = listed_shows()
+    shows = show_listing_query(getattr(listed, f'{entity}_id') == entity_id, now=now).\
+        order_by(listed.start_time, listed.id)
+    rows, genres, upcoming, past = await asyncio.gather(
+        fetch(select(*[column for column in model.__table__.c if column.name != 'geohash']).
+              where(model.id == entity_id)),
+        fetch(select(Genre.name).join(link, link.c.genre_id == Genre.id).
+              where(link.c[f'{entity}_id'] == entity_id).order_by(Genre.name)),
+        fetch(shows.filter(listed.start_time >= now).statement),
+        fetch(shows.filter(listed.start_time < now).statement)
+    )
+    if not rows:
+        return None
+    upcoming_shows = [show_info(row) for row in upcoming]
+    past_shows = [show_info(row) for row in past]
+    return dict(
+        rows[0]._mapping,
+        genres=[name for name, in genres],
+        upcoming_shows=upcoming_shows,
+        past_shows=past_shows,
+        upcoming_shows_count=len(upcoming_shows),
+        past_shows_count=len(past_shows)
+    )
+
+
+async def conditional(load, tags, *criterion, headers, timed=True):
+    (etag, last_modified), next_show = await resource_version(tags, *criterion, timed=timed)
+    if is_not_modified(etag, last_modified, parse_etags(headers.get('If-None-Match')),
+                       parse_date(headers.get('If-Modified-Since'))):
+        return versioned_response(None, etag, last_modified)
+    data = await load(next_show)
+    if data is None:
+        response = jsonify({'error': 'not found'})
+        response.status_code = 404
+        return response
+    return versioned_response(data, etag, last_modified)
+
+
+async def venue(venue_id, args, headers):
+    venue_id = int(venue_id)
+    return await conditional(
+        lambda next_show: get_cache().amemoize(
+            f'venue:{venue_id}', lambda: entity_detail(Venue, venue_id), expires=detail_transition
+        ),
+        [f'venue:{venue_id}'], Show.venue_id == venue_id, headers=headers
+    )
+
+
+async def artist(artist_id, args, headers):
+    artist_id = int(artist_id)
+    return await conditional(
+        lambda next_show: get_cache().amemoize(
+            f'artist:{artist_id}', lambda: entity_detail(Artist, artist_id), expires=detail_transition
+        ),
+        [f'artist:{artist_id}'], Show.artist_id == artist_id, headers=headers
+    )
+
+
+async def shows(args, headers):
+    args = show_page_args(args)
+
+    async def load_page():
+        query = show_page_query(args['after'], args['before'], args['page_size'],
+                                include_past=args['scope'] == 'all')
+        rows = await fetch(query.statement)
+        return show_page_result(rows, args['after'], args['before'], args['page_size'])
+
+    # The version lookup already found the next show to start, which is
+    # when an upcoming-only page goes stale.
+    return await conditional(
+        lambda next_show: get_cache().amemoize(
+            'shows', load_page, args['after'], args['before'], args['page_size'], args['scope'],
+            expires=lambda page: next_show if args['scope'] == 'upcoming' else None
+        ),
+        ['shows'], headers=headers
+    )
+
+
+ROUTES = [
+    (re.compile(r'/api/v1/venues/(\d+)'), venue),
+    (re.compile(r'/api/v1/artists/(\d+)'), artist),
+    (re.compile(r'/api/v1/shows'), shows),
+]
+
+
+class AsyncReads:
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            for pattern, handler in ROUTES:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    return await self.dispatch(handler, match.groups(), scope, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def dispatch(self, handler, params, scope, send):
+        args = url_decode(scope.get('query_string', b''))
+        headers = Headers([(key.decode('latin-1'), value.decode('latin-1'))
+                           for key, value in scope['headers']])
+        with self.app.app_context():
+            response = await handler(*params, args=args, headers=headers)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                        for key, value in response.headers.items()]
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'' if scope['method'] == 'HEAD' else response.get_data()
+        })
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.app.extensions['async_engine'].dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(app):
+    init_async(app)
+    return AsyncReads(app)
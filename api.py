@@ -0,0 +1,180 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from sqlalchemy import func, select
+from model import db, Show, DataVersion, SHOW_DEFAULT_DURATION, SHOW_MAX_DURATION
+from booking import end_time
+from queries import available_venues
+from loaders import venue_areas, venue_page, artist_list, artist_page, show_page_args, shows_page, \
+    near_args
+from geo import venues_near
+from cache import remember_versions
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def version_queries(tags, *criterion, timed=True):
+    # Statements behind a resource's ETag and Last-Modified: the stored tag
+    # versions plus, for data with an upcoming/past split, the show start
+    # times on either side of now. All are primary-key or index probes.
+    now = datetime.today()
+    queries = {
+        'versions': select(DataVersion.tag, DataVersion.version, DataVersion.updated_at).
+        where(DataVersion.tag.in_(tags))
+    }
+    if timed:
+        queries['next_show'] = select(func.min(Show.start_time)).\
+            where(Show.start_time >= now, *criterion)
+        queries['last_passed'] = select(func.max(Show.start_time)).\
+            where(Show.start_time < now, *criterion)
+    return queries
+
+
+def version_from(versions, next_show=None, last_passed=None, timed=True):
+    parts = sorted(f'{row.tag}={row.version}' for row in versions)
+    modified = [row.updated_at for row in versions]
+    if timed:
+        parts.append(f'next={next_show}')
+        if last_passed is not None:
+            # start_time is naive local time; versions are stored in UTC.
+            modified.append(last_passed.astimezone(timezone.utc).replace(tzinfo=None))
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return etag, max(modified) if modified else None
+
+
+def resource_version(tags, *criterion, timed=True):
+    queries = version_queries(tags, *criterion, timed=timed)
+    versions = db.session.execute(queries['versions']).all()
+    remember_versions(tags, versions)
+    if not timed:
+        return version_from(versions, timed=False)
+    return version_from(
+        versions,
+        db.session.execute(queries['next_show']).scalar(),
+        db.session.execute(queries['last_passed']).scalar()
+    )
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    if if_none_match:
+        return if_none_match.contains(etag)
+    return last_modified is not None and if_modified_since is not None and \
+        last_modified.replace(microsecond=0) <= if_modified_since.replace(tzinfo=None)
+
+
+def versioned_response(data, etag, last_modified):
+    # data is None for a 304.
+    response = Response(status=304) if data is None else jsonify(data)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(loader, tags, *criterion, timed=True):
+    etag, last_modified = resource_version(tags, *criterion, timed=timed)
+    if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+        return versioned_response(None, etag, last_modified)
+    data = loader()
+    if data is None:
+        abort(404)
+    return versioned_response(data, etag, last_modified)
+
+
+@api.route('/venues')
+def venues():
+    genre = request.args.get('genre')
+    return conditional(lambda: {'areas': venue_areas(genre)}, ['venues'])
+
+
+def naive_time(value):
+    # Show start times are stored naive; an offset-aware argument is taken
+    # to UTC first, as the date formatter does.
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        try:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        except OverflowError:
+            raise ValueError(f'{value} is out of range')
+    return value
+
+
+@api.route('/venues/available')
+def available():
+    # e.g. ?start=2026-10-24T20:00&duration=180&city=Austin&state=TX&seeking_talent=1
+    start = request.args.get('start', type=naive_time)
+    end = request.args.get('end', type=naive_time)
+    if start is None:
+        return jsonify({'error': 'start must be an ISO 8601 date and time'}), 400
+    if start < datetime.min + timedelta(minutes=SHOW_MAX_DURATION):
+        # The overlap test looks back SHOW_MAX_DURATION from start.
+        return jsonify({'error': 'start is out of range'}), 400
+    if end is None:
+        duration = request.args.get('duration', SHOW_DEFAULT_DURATION, type=int)
+        if not 0 < duration <= SHOW_MAX_DURATION:
+            return jsonify({'error': f'duration must be 1 to {SHOW_MAX_DURATION} minutes'}), 400
+        try:
+            end = end_time(start, duration)
+        except OverflowError:
+            return jsonify({'error': 'start is out of range'}), 400
+    if end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    seeking_talent = request.args.get('seeking_talent')
+    if seeking_talent is not None:
+        seeking_talent = seeking_talent.lower() not in ('0', 'false', 'no', '')
+    limit = request.args.get('limit', 50, type=int)
+    args = {
+        'city': request.args.get('city'),
+        'state': request.args.get('state'),
+        'genre': request.args.get('genre'),
+        'seeking_talent': seeking_talent,
+        'limit': max(1, min(limit, current_app.config['AVAILABILITY_MAX_RESULTS'])),
+    }
+
+    def load():
+        rows = available_venues(start, end, **args)
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'venues': [dict(row._mapping) for row in rows],
+        }
+
+    # Any venue edit or show booking moves one of these versions.
+    return conditional(load, ['venues', 'shows'], timed=False)
+
+
+@api.route('/venues/near')
+def near():
+    # ?lat=30.27&lon=-97.74&radius=10 (km)
+    args = near_args(request.args)
+    if args is None:
+        return jsonify({'error': 'lat and lon must be a valid latitude and longitude'}), 400
+    return conditional(lambda: {'venues': venues_near(**args)}, ['venues'], timed=False)
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return conditional(lambda: venue_page(venue_id), [f'venue:{venue_id}'], Show.venue_id == venue_id)
+
+
+@api.route('/artists')
+def artists():
+    genre = request.args.get('genre')
+    return conditional(lambda: {'artists': artist_list(genre)}, ['artists'], timed=False)
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return conditional(lambda: artist_page(artist_id), [f'artist:{artist_id}'], Show.artist_id == artist_id)
+
+
+@api.route('/shows')
+def shows():
+    args = show_page_args(request.args)
+    return conditional(lambda: shows_page(**args), ['shows'])
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return jsonify({'error': 'not found'}), 404
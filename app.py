@@ -4,8 +4,9 @@
 
 import json
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import os
+from flask import Flask, Blueprint, render_template, request, Response, flash, redirect, url_for, \
+  jsonify, abort, stream_with_context, current_app
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -13,39 +14,92 @@ from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from model import db, Venue, Artist, Show
+from model import db, init_db, Venue, Artist, Show, Genre, SHOW_DEFAULT_DURATION, SHOW_MAX_DURATION
+from queries import venues_with_upcoming_counts, stream_venue_areas, stream_shows, in_genre
+from routing import init_routing
+from search import init_search, search_backend
+from commands import register_commands
+from cache import init_cache, get_cache, record_change, venue_tags, artist_tags, show_tags
+from loaders import venue_areas, venue_page, artist_list, artist_page, show_page_args, shows_page, \
+  near_args
+from exporter import EXPORTS, export
+from api import api
+from profiling import init_profiling
+from summary import add_show, played_at, refresh
+from booking import booking_conflicts, tour_conflicts, schedule_tour
+from geo import init_geo, locate, venues_near
+from listing import init_listing
+from formatting import init_formatting, get_date_formatter
+from templating import init_templating, stream_page
 import sys
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
+main = Blueprint('main', __name__)
+moment = Moment()
+migrate = Migrate()
+
+
+def create_app(config=None):
+  app = Flask(__name__)
+  app.config.from_object('config')
+  # Any setting can be overridden from the environment as FLASK_<NAME>,
+  # e.g. FLASK_SECRET_KEY or FLASK_DB_POOL_SIZE=8.
+  app.config.from_prefixed_env()
+  if config:
+    app.config.update(config)
+
+  if not app.config.get('SECRET_KEY'):
+    if not (app.debug or app.testing):
+      # Every worker must sign sessions and CSRF tokens with the same key.
+      raise RuntimeError('SECRET_KEY is not set; export SECRET_KEY or FLASK_SECRET_KEY.')
+    app.config['SECRET_KEY'] = os.urandom(32)
+
+  moment.init_app(app)
+  init_formatting(app)
+  init_templating(app)
+  init_routing(app)
+  init_db(app)
+  migrate.init_app(app, db)
+  init_search(app)
+  init_cache(app)
+  init_geo(app)
+  init_listing(app)
+  app.register_blueprint(main)
+  app.register_blueprint(api)
+  init_profiling(app)
+  register_commands(app)
+
+  # app.logger is shared by every app this process creates (the ASGI
+  # wrapper, CLI commands, tests); attach the file handler only once.
+  if not app.debug and not app.testing and \
+      not any(isinstance(handler, FileHandler) for handler in app.logger.handlers):
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
 
-migrate = Migrate(app, db)
+  return app
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+@main.app_template_filter('datetime')
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
-app.jinja_env.filters['datetime'] = format_datetime
+  return get_date_formatter()(value, format)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -53,35 +107,26 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
 def venues():
-  areas = Venue.query.order_by(Venue.state, Venue.city, Venue.name).all()
-  data = []
-  prev_city = None
-  prev_state = None
-
-  for area in areas:
-    if area.city != prev_city or area.state != prev_state:
-      data.append(
-        {'city': area.city, 'state': area.state, 'venues':[]}
-      )
-    data[len(data)-1]['venues'].append(
-      {
-        'id': area.id, 
-        'name': area.name, 
-        'num_upcoming_shows': len(area.get_upcoming_shows())
-      }
-    )
-    prev_city = area.city
-    prev_state = area.state
+  genre = request.args.get('genre')
+  if request.args.get('stream') == '1':
+    # Uncached and unbuffered: rows go from the cursor to the client as the
+    # page renders, for catalogs too large to hold in memory.
+    criterion = [in_genre(Venue, genre)] if genre else []
+    return stream_page('pages/venues.html', areas=stream_venue_areas(*criterion))
+  data = venue_areas(genre)
 
   return render_template('pages/venues.html', areas=data)
 
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
 def search_venues():
   search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).order_by(Venue.name).all()
+  ids = search_backend().search(Venue, search_term)
+  rank = {venue_id: i for i, venue_id in enumerate(ids)}
+  venues = venues_with_upcoming_counts(Venue.id.in_(ids)) if ids else []
+  venues = sorted(venues, key=lambda venue: rank[venue.id])
   response = {
     'count': len(venues),
     'data': []
@@ -91,17 +136,28 @@ def search_venues():
       {
         'id': venue.id, 
         'name': venue.name, 
-        'num_upcoming_shows': len(venue.get_upcoming_shows())
+        'num_upcoming_shows': venue.num_upcoming_shows
       }
     )
 
   return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/near')
+def venues_near_point():
+  args = near_args(request.args)
+  if args is None:
+    abort(400)
+  venues = venues_near(**args)
+  return render_template('pages/venues_near.html', venues=venues, **args)
+
+
+@main.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-  venue = Venue.query.get(venue_id)
-  data = venue.get_info_venue()
+  data = venue_page(venue_id)
+  if data is None:
+    flash(f'Venue id {venue_id} not found!')
+    return render_template('pages/home.html')
 
   return render_template('pages/show_venue.html', venue=data)
 
@@ -109,34 +165,40 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   try:
     form = request.form
-    genres = form.getlist('genres')
-    
+    genres = Genre.from_names(form.getlist('genres'))
+
     venue = Venue(
       name = form.get('name'),
       city = form.get('city'),
       state = form.get('state'),
-      genres =  ','.join(genres),
+      genres = genres,
       address = form.get('address'),
       phone = form.get('phone'),
       website = form.get('website'),
       facebook_link = form.get('facebook_link'),
       image_link = form.get('image_link'),
       seeking_talent = True if form.get('seeking_talent') else False,
-      seeking_description = form.get('seeking_description')
+      seeking_description = form.get('seeking_description'),
+      **locate(form.get('address'), form.get('city'), form.get('state'))
     )
     db.session.add(venue)
+    record_change('venues')
     db.session.commit()
+    search_backend().index(venue)
     flash(f'Venue "{venue.name}" was successfully listed!')
+  except LookupError as error:
+    db.session.rollback()
+    flash(f'Venue "{form.get("name")}" could not be listed: {error}.')
   except:
     db.session.rollback()
     flash(f'An error occurred. Venue "{venue.name}" could not be listed.')
@@ -150,12 +212,18 @@ def create_venue_submission():
 #  Delete Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/<venue_id>/delete', methods=['POST', 'DELETE'])
+@main.route('/venues/<venue_id>/delete', methods=['POST', 'DELETE'])
 def delete_venue(venue_id):
   try:
     venue = Venue.query.get(venue_id)
+    record_change(*venue_tags(venue.id))
+    artist_ids = played_at(venue.id)
     db.session.delete(venue)
+    db.session.flush()
+    refresh('venue', [venue.id])
+    refresh('artist', artist_ids)
     db.session.commit()
+    search_backend().remove(Venue, venue.id)
     flash(f'Success deleting Venue "{venue.name}"')
   except:
     db.session.rollback()
@@ -170,11 +238,12 @@ def delete_venue(venue_id):
 #  Edit Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   venue = Venue.query.get(venue_id)
   if venue:
-    venue = venue.get_info_venue()
+    # The form has no use for the venue's shows.
+    venue = venue.get_info_venue(upcoming_shows=[], past_shows=[])
     form = VenueForm(data=venue)
     return render_template('forms/edit_venue.html', form=form, venue=venue)
   else:
@@ -182,16 +251,17 @@ def edit_venue(venue_id):
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   try:
     form = request.form
     venue = Venue.query.get(venue_id)
+    placed_at = (venue.address, venue.city, venue.state)
     venue.name = form.get('name')
     venue.city = form.get('city')
     venue.state = form.get('state')
     genres = form.getlist('genres')
-    venue.genres =  ','.join(genres)
+    venue.genres = Genre.from_names(genres)
     venue.address = form.get('address')
     venue.phone = form.get('phone')
     venue.website = form.get('website')
@@ -199,10 +269,20 @@ def edit_venue_submission(venue_id):
     venue.image_link = form.get('image_link')
     venue.seeking_talent = True if form.get('seeking_talent') else False
     venue.seeking_description = form.get('seeking_description')
+    if (venue.address, venue.city, venue.state) != placed_at:
+      # The old coordinates are wrong for the new address; a venue that
+      # can't be placed drops out of proximity search until it is.
+      for key, value in locate(venue.address, venue.city, venue.state).items():
+        setattr(venue, key, value)
 
     db.session.add(venue)
+    record_change(*venue_tags(venue_id))
     db.session.commit()
+    search_backend().index(venue)
     flash(f'Venue "{venue.name}" was successfully updated!')
+  except LookupError as error:
+    db.session.rollback()
+    flash(f'Venue "{form.get("name")}" could not be updated: {error}.')
   except:
     db.session.rollback()
     flash(f'An error occurred. Venue "{venue.name}" could not be updated.')
@@ -210,24 +290,26 @@ def edit_venue_submission(venue_id):
   finally:
     db.session.close()
 
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('.show_venue', venue_id=venue_id))
 
 
 #  Artists
 #  ----------------------------------------------------------------
 
-@app.route('/artists')
+@main.route('/artists')
 def artists():
-  artists = db.session.query(Artist.id, Artist.name).all()
+  artists = artist_list(request.args.get('genre'))
   return render_template('pages/artists.html', artists=artists)
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
 def search_artists():
   search_term = request.form.get('search_term', '')
+  ids = search_backend().search(Artist, search_term)
+  rank = {artist_id: i for i, artist_id in enumerate(ids)}
   artists = db.session.query(Artist.id, Artist.name).\
-      filter(Artist.name.ilike(f'%{search_term}%')).\
-      order_by(Artist.name).all()
+      filter(Artist.id.in_(ids)).all() if ids else []
+  artists = sorted(artists, key=lambda artist: rank[artist.id])
 
   response = {
     'count': len(artists),
@@ -236,34 +318,36 @@ def search_artists():
   return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  artist = Artist.query.get(artist_id)
-  data = artist.get_info_artist()
-  
+  data = artist_page(artist_id)
+  if data is None:
+    flash(f'Artist id {artist_id} not found!')
+    return render_template('pages/home.html')
+
   return render_template('pages/show_artist.html', artist=data)
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   try:
     form = request.form
 
-    genres = form.getlist('genres')
+    genres = Genre.from_names(form.getlist('genres'))
     artist = Artist(
       name = form.get('name'),
       city = form.get('city'),
       state = form.get('state'),
-      genres = ','.join(genres),
+      genres = genres,
       phone = form.get('phone'),
       website = form.get('website'),
       facebook_link = form.get('facebook_link'),
@@ -273,8 +357,13 @@ def create_artist_submission():
     )
 
     db.session.add(artist)
+    record_change('artists')
     db.session.commit()
+    search_backend().index(artist)
     flash(f'Artist "{artist.name}" was successfully listed!')
+  except LookupError as error:
+    db.session.rollback()
+    flash(f'Artist "{form.get("name")}" could not be listed: {error}.')
   except:
     db.session.rollback()
     flash(f'An error occurred. Artist "{artist.name}" could not be listed.')
@@ -288,11 +377,11 @@ def create_artist_submission():
 #  Edit Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   artist = Artist.query.get(artist_id)
   if artist:
-    artist = artist.get_info_artist()
+    artist = artist.get_info_artist(upcoming_shows=[], past_shows=[])
     form = ArtistForm(data=artist)
     return render_template('forms/edit_artist.html', form=form, artist=artist)
   else:
@@ -300,7 +389,7 @@ def edit_artist(artist_id):
     return render_template('pages/home.html')
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   try:
     form = request.form
@@ -309,7 +398,7 @@ def edit_artist_submission(artist_id):
     artist.city = form.get('city')
     artist.state = form.get('state')
     genres = form.getlist('genres')
-    artist.genres = ','.join(genres)
+    artist.genres = Genre.from_names(genres)
     artist.phone = form.get('phone')
     artist.website = form.get('website')
     artist.facebook_link = form.get('facebook_link')
@@ -318,8 +407,13 @@ def edit_artist_submission(artist_id):
     artist.seeking_description = form.get('seeking_description')
 
     db.session.add(artist)
+    record_change(*artist_tags(artist_id))
     db.session.commit()
+    search_backend().index(artist)
     flash(f'Artist "{artist.name}" was successfully updated!')
+  except LookupError as error:
+    db.session.rollback()
+    flash(f'Artist "{form.get("name")}" could not be updated: {error}.')
   except:
     db.session.rollback()
     flash(f'An error occurred. Artist "{artist.name}" could not be updated.')
@@ -327,37 +421,60 @@ def edit_artist_submission(artist_id):
   finally:
     db.session.close()
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
 def shows():
-  shows = Show.query.order_by(Show.start_time).all()
-  data = [show.get_info_show() for show in shows]
+  if request.args.get('stream') == '1':
+    # The full listing in one streamed page; see venues().
+    include_past = request.args.get('scope') == 'all'
+    return stream_page('pages/shows.html', shows=stream_shows(include_past), page={},
+      page_size=None, scope='all' if include_past else 'upcoming')
+  args = show_page_args(request.args)
+  page = shows_page(**args)
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=page['shows'], page=page,
+    page_size=args['page_size'], scope=args['scope'])
 
 
-@app.route('/shows/create')
+@main.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
   try:
     form = request.form
     show = Show(
       venue_id = form.get('venue_id'), 
       artist_id = form.get('artist_id'), 
-      start_time = form.get('start_time')
+      start_time = dateutil.parser.parse(form.get('start_time')),
+      duration = int(form.get('duration') or SHOW_DEFAULT_DURATION)
     )
+    if not 0 < show.duration <= SHOW_MAX_DURATION:
+      raise ValueError(f'duration must be 1 to {SHOW_MAX_DURATION} minutes')
+    conflicts = booking_conflicts(show.venue_id, show.artist_id, show.start_time, show.duration)
+    if conflicts:
+      db.session.rollback()
+      booked = [f'the {entity} is already booked at {shows[0].start_time:%Y-%m-%d %H:%M}'
+        for entity, shows in conflicts.items()]
+      flash(f'Show could not be listed: {" and ".join(booked)}.')
+      # Keep what was entered and mark the field that clashes.
+      show_form = ShowForm(form)
+      for entity, shows in conflicts.items():
+        getattr(show_form, f'{entity}_id').errors = [
+          f'Already booked at {shows[0].start_time:%Y-%m-%d %H:%M}']
+      return render_template('forms/new_show.html', form=show_form)
     db.session.add(show)
+    record_change(*show_tags(show.venue_id, show.artist_id))
+    add_show(show.venue_id, show.artist_id, show.start_time)
     db.session.commit()
     flash('Show was successfully listed!')
   except:
@@ -370,37 +487,95 @@ def create_show_submission():
   return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+@main.route('/shows/tour')
+def create_tour():
+  form = TourForm()
+  return render_template('forms/new_tour.html', form=form, problems=[])
+
+
+@main.route('/shows/tour', methods=['POST'])
+def create_tour_submission():
+  # Many shows for one artist, one per line: every line is checked before
+  # any is listed, and all of them go in with one insert and one commit.
+  form = TourForm(request.form)
+  lines = (form.dates.data or '').splitlines()
+  max_dates = current_app.config['TOUR_MAX_DATES']
+  try:
+    if not (form.artist_id.data or '').strip().isdigit():
+      raise LookupError(f'artist {form.artist_id.data!r} not found')
+    artist_id = int(form.artist_id.data)
+    dates, problems = form.tour_dates()
+    total = len(dates) + len(problems)
+    if total > max_dates:
+      flash(f'A tour can list at most {max_dates} shows at once.')
+      return render_template('forms/new_tour.html', form=form, problems=[])
+    for line, found in tour_conflicts(artist_id, dates).items():
+      problems.setdefault(line, []).extend(found)
+    if problems or not dates:
+      db.session.rollback()
+      flash(f'Tour could not be listed: {len(problems)} of {total} shows have problems.'
+        if problems else 'Tour could not be listed: no shows given.')
+      return render_template('forms/new_tour.html', form=form,
+        problems=[(line, lines[line - 1], problems[line]) for line in sorted(problems)])
+    schedule_tour(artist_id, dates)
+    db.session.commit()
+    flash(f'{len(dates)} shows were successfully listed!')
+  except LookupError:
+    db.session.rollback()
+    flash(f'Tour could not be listed: artist {form.artist_id.data!r} not found.')
+    return render_template('forms/new_tour.html', form=form, problems=[])
+  except:
+    db.session.rollback()
+    flash('An error occurred. Tour could not be listed.')
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/export/<entity>.<fmt>')
+def export_catalog(entity, fmt):
+  if entity not in EXPORTS or fmt not in ('jsonl', 'csv'):
+    abort(404)
+  mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+  return Response(
+    stream_with_context(export(entity, fmt)),
+    mimetype=mimetype,
+    headers={'Content-Disposition': f'attachment; filename={entity}.{fmt}'}
+  )
+
+
+@main.route('/cache/stats')
+def cache_stats():
+  return jsonify(get_cache().stats())
+
+
+@main.route('/metrics')
+def metrics():
+  body = current_app.extensions['metrics'].render(get_cache().stats())
+  return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
-# Default port:
-if __name__ == '__main__':
-    app.run()
-
-# Or specify port manually:
-'''
+# Development server only; production runs wsgi:app under gunicorn
+# (see gunicorn.conf.py).
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
+    create_app().run(port=port)
@@ -0,0 +1,5 @@
+from app import create_app
+from aio import create_asgi_app
+
+# uvicorn asgi:app --workers N
+app = create_asgi_app(create_app())
@@ -0,0 +1,233 @@
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from itertools import count, repeat
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from model import db, Venue, Artist
+from cache import Cache, NullCache
+
+# (name, method, path, form data). {venue}/{artist} are replaced with ids of
+# existing rows and {term} with a word from a venue name. Writes run last and
+# only touch rows they create themselves.
+READ_ROUTES = [
+    ('home', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('venues_by_genre', 'GET', '/venues?genre=Jazz', None),
+    ('venue_search', 'POST', '/venues/search', {'search_term': '{term}'}),
+    ('venue_detail', 'GET', '/venues/{venue}', None),
+    ('venue_create_form', 'GET', '/venues/create', None),
+    ('venue_edit_form', 'GET', '/venues/{venue}/edit', None),
+    ('artists', 'GET', '/artists', None),
+    ('artist_search', 'POST', '/artists/search', {'search_term': '{term}'}),
+    ('artist_detail', 'GET', '/artists/{artist}', None),
+    ('artist_create_form', 'GET', '/artists/create', None),
+    ('artist_edit_form', 'GET', '/artists/{artist}/edit', None),
+    ('shows', 'GET', '/shows', None),
+    ('shows_all', 'GET', '/shows?scope=all', None),
+    ('show_create_form', 'GET', '/shows/create', None),
+    ('tour_create_form', 'GET', '/shows/tour', None),
+    ('api_venues', 'GET', '/api/v1/venues', None),
+    ('api_venue', 'GET', '/api/v1/venues/{venue}', None),
+    ('api_artists', 'GET', '/api/v1/artists', None),
+    ('api_artist', 'GET', '/api/v1/artists/{artist}', None),
+    ('api_shows', 'GET', '/api/v1/shows', None),
+    ('api_available', 'GET', '/api/v1/venues/available?start={saturday}&duration=180&city={city}'
+     '&state={state}&seeking_talent=1', None),
+    ('export_venues', 'GET', '/export/venues.jsonl', None),
+    ('export_shows', 'GET', '/export/shows.csv', None),
+    ('cache_stats', 'GET', '/cache/stats', None),
+    ('metrics', 'GET', '/metrics', None),
+]
+
+VENUE_FORM = {'name': 'Bench Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Bench St',
+              'phone': '512-555-0100', 'genres': ['Jazz'], 'facebook_link': '', 'image_link': ''}
+ARTIST_FORM = {'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX',
+               'phone': '512-555-0101', 'genres': ['Jazz'], 'facebook_link': '', 'image_link': ''}
+
+WRITE_ROUTES = [
+    ('venue_create', 'POST', '/venues/create', VENUE_FORM),
+    ('venue_edit', 'POST', '/venues/{new_venue}/edit', VENUE_FORM),
+    ('artist_create', 'POST', '/artists/create', ARTIST_FORM),
+    ('artist_edit', 'POST', '/artists/{new_artist}/edit', ARTIST_FORM),
+    ('show_create', 'POST', '/shows/create',
+     {'venue_id': '{new_venue}', 'artist_id': '{new_artist}', 'start_time': '{show_start}'}),
+    ('tour_create', 'POST', '/shows/tour', {'artist_id': '{new_artist}', 'dates': '{tour}'}),
+    ('venue_delete', 'POST', '/venues/{new_venue}/delete', None),
+]
+SHOW_SLOTS = datetime(2100, 1, 1, 20)
+TOUR_SLOTS = datetime(2200, 1, 1, 20)
+TOUR_DATES = 60
+
+
+def tour_dates(venue, tour):
+    # TOUR_DATES nights in a row at one venue, after those of earlier tours.
+    first = TOUR_SLOTS + timedelta(days=tour * TOUR_DATES)
+    return '\n'.join(f'{venue}, {first + timedelta(days=night)}' for night in range(TOUR_DATES))
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(Engine, 'after_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'after_cursor_execute', self)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+class Bench:
+
+    def __init__(self, app, iterations=20, warmup=2, cache=False):
+        self.app = app
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cache = cache
+        self.client = app.test_client()
+
+    @staticmethod
+    def ids():
+        # The lowest ids carry the most shows in generated data.
+        venue = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).order_by(Venue.id).first()
+        artist = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+        today = datetime.today().replace(hour=20, minute=0, second=0, microsecond=0)
+        return {
+            'venue': venue.id if venue else 1,
+            'artist': artist or 1,
+            'term': venue.name.split()[0] if venue else 'a',
+            'city': venue.city if venue else 'Austin',
+            'state': venue.state if venue else 'TX',
+            'saturday': (today + timedelta(days=(5 - today.weekday()) % 7)).isoformat(),
+        }
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        # Drain streamed bodies so their queries and time are counted.
+        response.get_data()
+        response.close()
+        # Under the CLI the app context outlives the request, and with it the
+        # session; start every request with an empty identity map as it would
+        # in production.
+        db.session.remove()
+        return response.status_code
+
+    def measure(self, method, requests, warmup=0):
+        # requests yields the (path, data) of every request: the same one for
+        # reads, a fresh row or show slot each time for writes. The last
+        # request runs under tracemalloc, which would distort the timings.
+        for _ in range(warmup):
+            self.request(method, *next(requests))
+        samples = []
+        with QueryCounter() as counter:
+            for _ in range(self.iterations):
+                start = time.perf_counter()
+                status = self.request(method, *next(requests))
+                samples.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        try:
+            self.request(method, *next(requests))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'status': status,
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'queries': counter.count // self.iterations,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def created(model, count):
+        ids = db.session.query(model.id).order_by(model.id.desc()).limit(count).all()
+        return sorted(id for id, in ids)
+
+    def run(self, writes=True, report=print):
+        cache = self.app.extensions['cache']
+        if not self.cache:
+            # Measure the database and rendering work, not cache hits.
+            self.app.extensions['cache'] = Cache(NullCache(), cache.default_timeout)
+        results = {}
+        try:
+            ids = self.ids()
+            db.session.remove()
+            for name, method, path, data in READ_ROUTES:
+                results[name] = self.measure(method, repeat((fill(path, ids), fill(data, ids))), self.warmup)
+                report(name, results[name])
+            if writes:
+                # Each create makes iterations + 1 rows, one per request; the
+                # deletes then remove exactly those venues. Shows go a day
+                # apart so none of them is turned away as a double booking.
+                for name, method, path, data in WRITE_ROUTES:
+                    if name == 'venue_delete':
+                        requests = ((path.format(new_venue=id), data) for id in new_venues)
+                    else:
+                        requests = ((fill(path, ids), fill(data, dict(
+                                        ids, show_start=SHOW_SLOTS + timedelta(days=day),
+                                        tour=tour_dates(ids.get('new_venue'), day) if name == 'tour_create' else None
+                                    ))) for day in count())
+                    results[name] = self.measure(method, requests)
+                    if name in ('venue_create', 'artist_create'):
+                        model = Venue if name == 'venue_create' else Artist
+                        created = self.created(model, self.iterations + 1)
+                        db.session.remove()
+                        ids[f'new_{model.__tablename__}'] = created[0]
+                        if model is Venue:
+                            new_venues = created
+                    report(name, results[name])
+        finally:
+            self.app.extensions['cache'] = cache
+        return results
+
+
+def compare(results, baseline, tolerance=0.5, noise_ms=2.0):
+    # Query counts are deterministic and must not grow. Latency and memory may
+    # drift by the tolerance, and latency by a small absolute amount as well
+    # so sub-millisecond routes do not flap. Latency is judged on the median;
+    # p95 of a few dozen samples is mostly scheduler noise.
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            regressions.append(f'{name}: {previous["queries"]} -> {result["queries"]} queries')
+        limit = max(previous['p50_ms'] * (1 + tolerance), previous['p50_ms'] + noise_ms)
+        if result['p50_ms'] > limit:
+            regressions.append(f'{name}: p50 {previous["p50_ms"]} -> {result["p50_ms"]} ms')
+        if result['peak_kb'] > previous['peak_kb'] * (1 + tolerance) + 64:
+            regressions.append(f'{name}: peak {previous["peak_kb"]} -> {result["peak_kb"]} KB')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,176 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from model import db, Venue, Artist, Show, SHOW_MAX_DURATION
+from summary import refresh
+from cache import record_change, show_tags
+
+# Double-booking checks. No show runs longer than SHOW_MAX_DURATION, so the
+# only shows that can overlap [start, end) are those starting in
+# (start - SHOW_MAX_DURATION, end): one range scan on the (venue_id,
+# start_time) or (artist_id, start_time) index, whatever the catalog size,
+# then an exact check on the few candidates.
+
+BOOKED = {
+    'venue': (Venue, Show.venue_id),
+    'artist': (Artist, Show.artist_id),
+}
+
+
+def end_time(start_time, duration):
+    return start_time + timedelta(minutes=duration)
+
+
+def candidates(entity, entity_id, start_time, duration):
+    _, key = BOOKED[entity]
+    return Show.query.filter(
+        key == entity_id,
+        Show.start_time > start_time - timedelta(minutes=SHOW_MAX_DURATION),
+        Show.start_time < end_time(start_time, duration)
+    ).order_by(Show.start_time)
+
+
+class show_end(FunctionElement):
+    # Show.start_time plus its duration, computed in SQL.
+    type = DateTime()
+    name = 'show_end'
+    inherit_cache = True
+
+
+@compiles(show_end)
+def compile_show_end(element, compiler, **kw):
+    return (f"({compiler.process(Show.start_time, **kw)} + "
+            f"{compiler.process(Show.duration, **kw)} * INTERVAL '1 minute')")
+
+
+@compiles(show_end, 'sqlite')
+def compile_show_end_sqlite(element, compiler, **kw):
+    # Same text format SQLAlchemy stores SQLite datetimes in, so the result
+    # compares correctly against start_time values and parameters.
+    return (f"(strftime('%Y-%m-%d %H:%M:%f', {compiler.process(Show.start_time, **kw)}, "
+            f"'+' || {compiler.process(Show.duration, **kw)} || ' minutes') || '000')")
+
+
+def overlaps(start_time, end):
+    # Shows overlapping [start_time, end), for use in SQL (e.g. an anti-join).
+    # Next to a venue_id/artist_id equality the start_time bounds are an
+    # index range scan; show_end() only checks the rows in range.
+    return and_(
+        Show.start_time > start_time - timedelta(minutes=SHOW_MAX_DURATION),
+        Show.start_time < end,
+        show_end() > start_time
+    )
+
+
+def overlapping(entity, entity_id, start_time, duration):
+    return [show for show in candidates(entity, entity_id, start_time, duration)
+            if end_time(show.start_time, show.duration) > start_time]
+
+
+def booking_conflicts(venue_id, artist_id, start_time, duration):
+    # Locks the venue and artist rows first, so two bookings for either one
+    # can't both pass the check and commit; returns {entity: [shows]} for
+    # whichever of them is already busy, and raises LookupError for an
+    # unknown id.
+    conflicts = {}
+    for entity, entity_id in (('venue', venue_id), ('artist', artist_id)):
+        model, _ = BOOKED[entity]
+        if db.session.query(model.id).filter(model.id == entity_id).with_for_update().scalar() is None:
+            raise LookupError(f'{entity} {entity_id} not found')
+        shows = overlapping(entity, entity_id, start_time, duration)
+        if shows:
+            conflicts[entity] = shows
+    return conflicts
+
+
+def find_conflicts(since=None, batch_size=1000):
+    # Every overlapping pair in one pass over show in start_time order,
+    # remembering per venue and per artist the booked show that ends last.
+    # A show is reported once per entity, against that show. Yields
+    # (entity, entity_id, earlier show id, show id, overlap end).
+    query = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration)
+    if since is not None:
+        query = query.filter(Show.start_time >= since - timedelta(minutes=SHOW_MAX_DURATION))
+    busy = {}
+    for show in query.order_by(Show.start_time, Show.id).yield_per(batch_size):
+        end = end_time(show.start_time, show.duration)
+        for entity, entity_id in (('venue', show.venue_id), ('artist', show.artist_id)):
+            if entity_id is None:
+                continue
+            booked = busy.get((entity, entity_id))
+            if booked and booked[0] > show.start_time:
+                overlap_end = min(booked[0], end)
+                if since is None or overlap_end > since:
+                    yield entity, entity_id, booked[1], show.id, overlap_end
+                if booked[0] >= end:
+                    continue
+            busy[(entity, entity_id)] = (end, show.id)
+
+
+def tour_conflicts(artist_id, dates):
+    # Checks a tour, {line: (venue_id, start_time, duration)} for one
+    # artist, as a whole: unknown venues, dates overlapping each other, and
+    # dates overlapping existing shows, found with one query per entity
+    # whose OR-ed windows are each an index range. Locks the artist and the
+    # venues like booking_conflicts(); returns {line: [problems]} and raises
+    # LookupError for an unknown artist.
+    problems = defaultdict(list)
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).with_for_update().scalar() is None:
+        raise LookupError(f'artist {artist_id} not found')
+    if not dates:
+        return {}
+    venue_ids = sorted({venue_id for venue_id, _, _ in dates.values()})
+    known = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)).
+             order_by(Venue.id).with_for_update()}
+    for line, (venue_id, _, _) in dates.items():
+        if venue_id not in known:
+            problems[line].append(f'venue {venue_id} not found')
+
+    # Every date is the artist's, so any two that overlap clash on the
+    # artist whether or not they share a venue.
+    latest = None
+    for line, (_, start_time, duration) in sorted(dates.items(), key=lambda item: (item[1][1], item[0])):
+        if latest and latest[0] > start_time:
+            problems[line].append(f'overlaps line {latest[1]} of this tour')
+        if not latest or end_time(start_time, duration) > latest[0]:
+            latest = (end_time(start_time, duration), line)
+
+    for entity in ('artist', 'venue'):
+        _, key = BOOKED[entity]
+        owner = {line: artist_id if entity == 'artist' else venue_id
+                 for line, (venue_id, _, _) in dates.items()}
+        windows = [and_(
+            key == owner[line],
+            Show.start_time > start_time - timedelta(minutes=SHOW_MAX_DURATION),
+            Show.start_time < end_time(start_time, duration)
+        ) for line, (_, start_time, duration) in dates.items()]
+        booked = defaultdict(list)
+        for show in db.session.query(key, Show.start_time, Show.duration).\
+                filter(or_(*windows)).order_by(Show.start_time):
+            booked[show[0]].append(show)
+        for line, (_, start_time, duration) in dates.items():
+            for show in booked[owner[line]]:
+                if show.start_time < end_time(start_time, duration) and \
+                        end_time(show.start_time, show.duration) > start_time:
+                    problems[line].append(f'the {entity} is already booked at {show.start_time:%Y-%m-%d %H:%M}')
+                    break
+    return dict(problems)
+
+
+def schedule_tour(artist_id, dates):
+    # Inserts the checked dates of a tour in one flush and updates what
+    # depends on show, in the caller's transaction. Ids come from the
+    # database, so concurrent requests can't collide the way the importer's
+    # reserved ids could; on psycopg2 the ORM sends the rows as one batched
+    # INSERT ... RETURNING. Show listings follow from the flush hook.
+    shows = [Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, duration=duration)
+             for venue_id, start_time, duration in dates.values()]
+    db.session.add_all(shows)
+    db.session.flush()
+    venue_ids = sorted({show.venue_id for show in shows})
+    refresh('venue', venue_ids)
+    refresh('artist', [artist_id])
+    record_change(*{tag for venue_id in venue_ids for tag in show_tags(venue_id, artist_id)})
+    return [show.id for show in shows]
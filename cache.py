@@ -0,0 +1,265 @@
+import math
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app, g, has_app_context
+from sqlalchemy import select
+from model import db, Show, DataVersion
+from routing import replica_may_lag
+
+
+class MemoryCache:
+    # LRU with per-entry expiry, shared by the threads of one process.
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisCache:
+    # Any client with the redis-py get/set/delete/flushdb interface.
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        self.client.flushdb()
+
+
+class FakeRedis:
+    # Minimal in-process stand-in for a redis client, for local runs.
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.time() + ex if ex else None)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def flushdb(self):
+        self.data.clear()
+
+
+class Cache:
+    # Values are stored under '<tag>:<version>:<args>', version being the
+    # tag's DataVersion row. Writes bump it in their own transaction, so once
+    # one commits every worker reads the new version and misses, whatever
+    # the backend; entries for older versions (e.g. each page of /shows) are
+    # never read again and age out.
+
+    def __init__(self, backend, default_timeout=300):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, tag, args, version):
+        return f'{tag}:{version[0]}:{args!r}'
+
+    def memoize(self, tag, loader, *args, timeout=None, expires=None):
+        # expires(value) may return the datetime at which the value turns
+        # stale on its own (e.g. when the next upcoming show starts); the
+        # entry then lives no longer than that.
+        version = stored_version(tag)
+        key = self.key(tag, args, version)
+        value = self.lookup(key)
+        if value is None:
+            value = self.keep(key, version, loader(), timeout, expires)
+        return value
+
+    async def amemoize(self, tag, loader, *args, timeout=None, expires=None):
+        # memoize() for coroutine loaders; entries are shared with it.
+        version = stored_version(tag)
+        key = self.key(tag, args, version)
+        value = self.lookup(key)
+        if value is None:
+            value = self.keep(key, version, await loader(), timeout, expires)
+        return value
+
+    def lookup(self, key):
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def keep(self, key, version, value, timeout=None, expires=None):
+        # A replica may not have replayed the write behind a recent version
+        # yet: serve what it returned, but don't keep it.
+        if version[1] is not None and replica_may_lag(version[1]):
+            return value
+        return self.store(key, value, timeout, expires)
+
+    def store(self, key, value, timeout=None, expires=None):
+        if value is None:
+            return value
+        timeout = timeout or self.default_timeout
+        stale_at = expires(value) if expires else None
+        if stale_at is not None:
+            timeout = min(timeout, math.ceil((stale_at - datetime.today()).total_seconds()))
+        if timeout > 0:
+            self.backend.set(key, value, timeout)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+def init_cache(app):
+    name = app.config.get('CACHE_BACKEND', 'memory')
+    if name == 'memory':
+        backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 10000))
+    elif name == 'redis':
+        import redis
+        backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+    elif name == 'fakeredis':
+        backend = RedisCache(FakeRedis())
+    else:
+        backend = NullCache()
+    cache = Cache(backend, app.config.get('CACHE_DEFAULT_TIMEOUT', 300))
+    app.extensions['cache'] = cache
+
+    @app.teardown_request
+    def forget_versions(error=None):
+        # g outlives the request when an app context was already pushed
+        # (CLI commands, tests).
+        g.pop('data_versions', None)
+
+    return cache
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+#  Write-driven invalidation
+#  ----------------------------------------------------------------
+
+def record_change(*tags):
+    # Bump the stored versions of the tags inside the current transaction;
+    # they drive the API's ETags and the cache keys, so the change shows up
+    # everywhere once it commits.
+    DataVersion.bump(tags)
+
+
+def stored_version(tag):
+    # (version, updated_at in ns) of a tag, (0, None) before its first
+    # write. A version the request already read (see remember_versions) is
+    # reused, so a response's body is cached under the same version its
+    # ETag was computed from.
+    known = g.get('data_versions', {}) if has_app_context() else {}
+    if tag in known:
+        return known[tag]
+    row = db.session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.tag == tag)
+    ).first()
+    return as_version(row)
+
+
+def remember_versions(tags, rows):
+    # rows: (tag, version, updated_at) as read for an ETag.
+    if has_app_context():
+        known = g.setdefault('data_versions', {})
+        found = {row.tag: row for row in rows}
+        for tag in tags:
+            known[tag] = as_version(found.get(tag))
+
+
+def as_version(row):
+    if row is None:
+        return 0, None
+    # updated_at is stored in UTC.
+    return row.version, int(row.updated_at.replace(tzinfo=timezone.utc).timestamp() * 1e9)
+
+
+def venue_tags(venue_id):
+    # A venue's name and image appear on show tiles and on the detail page of
+    # every artist who played there.
+    artist_ids = db.session.query(Show.artist_id).\
+        filter(Show.venue_id == venue_id).distinct()
+    return ['venues', f'venue:{venue_id}', 'shows'] + \
+        [f'artist:{artist_id}' for artist_id, in artist_ids]
+
+
+def artist_tags(artist_id):
+    venue_ids = db.session.query(Show.venue_id).\
+        filter(Show.artist_id == artist_id).distinct()
+    return ['artists', f'artist:{artist_id}', 'shows'] + \
+        [f'venue:{venue_id}' for venue_id, in venue_ids]
+
+
+def show_tags(venue_id, artist_id):
+    return ['shows', 'venues', f'venue:{venue_id}', f'artist:{artist_id}']
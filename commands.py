@@ -0,0 +1,368 @@
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from model import db, Venue, Artist, ShowListing, VenueSummary, SHOW_DEFAULT_DURATION
+from queries import venue_counts_query, listed_shows, show_listing_query, in_genre, available_venues
+from search import PostgresSearchBackend, search_backend, tokenize
+from importer import Importer, ImportState, read_rows
+from exporter import EXPORTS, export
+from synthetic import Generator, reset_database
+from bench import Bench, compare, load_baseline, percentile, save_baseline
+from summary import refresh, roll
+from listing import refresh_listings
+from booking import candidates, find_conflicts
+from geo import locate, near_query
+from cache import record_change
+
+
+def timed(fn, terms):
+    samples = []
+    for term in terms:
+        start = time.perf_counter()
+        fn(term)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+@click.command('search-bench')
+@click.option('--entity', type=click.Choice(['venue', 'artist']), default='venue')
+@click.option('--queries', default=200, help='Number of search terms to sample.')
+@click.option('--seed', default=0)
+@with_appcontext
+def search_bench(entity, queries, seed):
+    """Compare search backend latency against the ILIKE scan."""
+    model = Venue if entity == 'venue' else Artist
+    rows = db.session.query(model.name, model.city).\
+        order_by(db.func.random()).limit(queries).all()
+    if not rows:
+        raise click.ClickException(f'No {entity} rows to sample search terms from.')
+
+    rng = random.Random(seed)
+    terms = []
+    for row in rows:
+        token = rng.choice(tokenize(f'{row.name} {row.city}') or ['a'])
+        terms.append(token[:max(3, len(token) - 2)])
+
+    backend = search_backend()
+    ilike = timed(lambda term: db.session.query(model.id).
+                  filter(model.name.ilike(f'%{term}%')).order_by(model.name).all(), terms)
+    indexed = timed(lambda term: backend.search(model, term), terms)
+
+    total = db.session.query(model).count()
+    click.echo(f'{entity}: {total} rows, {len(terms)} queries, backend {type(backend).__name__}')
+    for label, samples in (('ilike', ilike), ('backend', indexed)):
+        click.echo(f'  {label:8} p50 {percentile(samples, 50):8.2f} ms  p95 {percentile(samples, 95):8.2f} ms')
+
+
+def advised_queries():
+    # (name, query, tables a full scan of which is expected)
+    now = datetime.today()
+    any_venue = db.session.query(Venue.id).limit(1).scalar() or 1
+    any_artist = db.session.query(Artist.id).limit(1).scalar() or 1
+    shows = listed_shows()
+    queries = [
+        ('venues listing', venue_counts_query(), {'venue'}),
+        ('venues by genre', venue_counts_query(in_genre(Venue, 'Jazz')), set()),
+        ('venue detail shows', show_listing_query(shows.venue_id == any_venue).
+            order_by(shows.start_time, shows.id), set()),
+        ('artist detail shows', show_listing_query(shows.artist_id == any_artist).
+            order_by(shows.start_time, shows.id), set()),
+        ('shows page', show_listing_query(shows.start_time >= now).
+            order_by(shows.start_time, shows.id).limit(30), set()),
+        ('summaries to roll', db.session.query(VenueSummary.venue_id).
+            filter(VenueSummary.next_show < now), set()),
+        ('venue booking check', candidates('venue', any_venue, now, SHOW_DEFAULT_DURATION), set()),
+        ('artist booking check', candidates('artist', any_artist, now, SHOW_DEFAULT_DURATION), set()),
+        ('venues near', near_query(30.2672, -97.7431, 10), set()),
+        ('available venues', available_venues(now, now + timedelta(hours=3), city='Austin', state='TX',
+                                              seeking_talent=True), set()),
+    ]
+    backend = search_backend()
+    if isinstance(backend, PostgresSearchBackend):
+        # genre has a few dozen rows; scanning it is expected.
+        for model in (Venue, Artist):
+            queries.append((f'{model.__tablename__} search',
+                            backend.match_query(model, 'jazz', ['jazz']), {'genre'}))
+    return queries
+
+
+def explain(query):
+    connection = db.session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(postgres_scans(plan[0]['Plan'])), plan
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+        scans = [row[-1].split()[1] for row in rows
+                 if row[-1].startswith('SCAN ') and ' USING ' not in row[-1]]
+        return scans, [row[-1] for row in rows]
+    raise click.ClickException(f'db-advise does not support {connection.dialect.name}.')
+
+
+def postgres_scans(node):
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from postgres_scans(child)
+
+
+@click.command('db-advise')
+@click.option('--verbose', is_flag=True, help='Print the full plan of every query.')
+@click.option('--strict', is_flag=True, help='Exit non-zero on unexpected sequential scans.')
+@with_appcontext
+def db_advise(verbose, strict):
+    """EXPLAIN the app's core queries and report sequential scans."""
+    unexpected = 0
+    for name, query, expected in advised_queries():
+        scans, plan = explain(query)
+        flagged = [table for table in scans if table not in expected]
+        unexpected += len(flagged)
+        status = 'SEQ SCAN ' + ', '.join(flagged) if flagged else 'ok'
+        click.echo(f'{name:22} {status}')
+        if verbose:
+            click.echo(json.dumps(plan, indent=2) if isinstance(plan, list) and plan and isinstance(plan[0], dict)
+                       else '\n'.join(f'    {line}' for line in plan))
+    if strict and unexpected:
+        raise SystemExit(1)
+
+
+@click.command('import')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False))
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False))
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=1000)
+@click.option('--state', 'state_path', default='import-state.json',
+              help='Checkpoint file; rerun with the same file to resume.')
+@with_appcontext
+def import_catalog(venues, artists, shows, fmt, chunk_size, state_path):
+    """Bulk-load venues, artists and shows from CSV/JSONL files.
+
+    Venue and artist rows may carry an 'id' column used as their reference;
+    show rows refer to those references in venue_id/artist_id.
+    """
+    paths = {'venue': venues, 'artist': artists, 'show': shows}
+    importer = Importer(ImportState(state_path), chunk_size=chunk_size, report=click.echo)
+    for entity, path in paths.items():
+        if path:
+            importer.run(entity, read_rows(path, fmt))
+    for entity, line, errors in importer.errors:
+        click.echo(f'{entity} row {line}: {errors}', err=True)
+
+    backend = search_backend()
+    for entity, model in (('venue', Venue), ('artist', Artist)):
+        if paths[entity]:
+            backend.rebuild(model)
+    db.session.commit()
+    click.echo(f'{len(importer.errors)} rows rejected')
+
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default='jsonl')
+@click.option('--output', type=click.File('w'), default='-')
+@with_appcontext
+def export_catalog(entity, fmt, output):
+    """Stream venues, artists or shows as JSONL or CSV."""
+    for chunk in export(entity, fmt):
+        output.write(chunk)
+
+
+@click.command('seed')
+@click.option('--shows', default=1000, help='Number of shows to generate.')
+@click.option('--venues', type=int, help='Defaults to one venue per 100 shows.')
+@click.option('--artists', type=int, help='Defaults to one artist per 50 shows.')
+@click.option('--seed', default=0)
+@click.option('--chunk-size', default=10000)
+@click.option('--reset', is_flag=True, help='Empty every table first.')
+@with_appcontext
+def seed(shows, venues, artists, seed, chunk_size, reset):
+    """Populate the database with synthetic venues, artists and shows."""
+    if reset:
+        reset_database()
+    Generator(seed=seed, chunk_size=chunk_size, report=click.echo).run(shows, venues, artists)
+
+
+@click.command('bench')
+@click.option('--scale', 'scales', type=int, multiple=True,
+              help='Reseed with this many shows and benchmark; repeatable. Empties the database.')
+@click.option('--iterations', default=20)
+@click.option('--warmup', default=2)
+@click.option('--cache', is_flag=True, help='Benchmark with the response cache enabled.')
+@click.option('--no-writes', is_flag=True, help='Skip the create/edit/delete routes.')
+@click.option('--baseline', 'baseline_path', default='bench-baseline.json')
+@click.option('--save', is_flag=True, help='Store these results as the new baseline.')
+@click.option('--tolerance', default=0.5, help='Allowed latency/memory growth over the baseline.')
+@with_appcontext
+def bench(scales, iterations, warmup, cache, no_writes, baseline_path, save, tolerance):
+    """Drive every route through the test client and compare to a baseline.
+
+    Records p50/p95 latency, SQL queries per request and peak allocated
+    memory per route. Exits non-zero when a route regresses against the
+    baseline, or when its query count grows with the data set size.
+    """
+    app = current_app._get_current_object()
+
+    def report(name, result):
+        click.echo(f'  {name:20} {result["status"]}  p50 {result["p50_ms"]:8.2f} ms  '
+                   f'p95 {result["p95_ms"]:8.2f} ms  {result["queries"]:3} queries  '
+                   f'{result["peak_kb"]:9.1f} KB')
+
+    results = {}
+    for scale in scales or (None,):
+        if scale is not None:
+            click.echo(f'seeding {scale} shows')
+            reset_database()
+            Generator(report=lambda line: None).run(scale)
+        db.session.remove()
+        label = str(scale) if scale is not None else 'current'
+        click.echo(f'{label}: {db.engine.url.get_backend_name()}, '
+                   f'{iterations} iterations, cache {"on" if cache else "off"}')
+        results[label] = Bench(app, iterations, warmup, cache).run(writes=not no_writes, report=report)
+
+    regressions = []
+    if len(results) > 1:
+        runs = list(results.values())
+        for name in runs[0]:
+            counts = [run[name]['queries'] for run in runs]
+            if len(set(counts)) > 1:
+                regressions.append(f'{name}: queries vary with scale {counts}')
+
+    if save:
+        save_baseline(baseline_path, results)
+        click.echo(f'baseline saved to {baseline_path}')
+    elif os.path.exists(baseline_path):
+        baseline = load_baseline(baseline_path)
+        for label, run in results.items():
+            regressions.extend(f'[{label}] {line}'
+                               for line in compare(run, baseline.get(label, {}), tolerance))
+
+    for line in regressions:
+        click.echo(f'REGRESSION {line}', err=True)
+    if regressions:
+        raise SystemExit(1)
+
+
+@click.command('roll-summaries')
+@click.option('--rebuild', is_flag=True, help='Recompute every summary row from show.')
+@with_appcontext
+def roll_summaries(rebuild):
+    """Move started shows from upcoming to past in the summary tables.
+
+    Run every minute or so, e.g. from cron.
+    """
+    if rebuild:
+        refresh('venue')
+        refresh('artist')
+        db.session.commit()
+        click.echo('summaries rebuilt')
+        return
+    rolled = roll()
+    db.session.commit()
+    click.echo(f'{rolled} summaries rolled')
+
+
+@click.command('rebuild-listings')
+@with_appcontext
+def rebuild_listings():
+    """Copy every show into the show_listing table.
+
+    Run after turning SHOW_LISTING_TABLE on; writes keep it current from then.
+    """
+    refresh_listings()
+    db.session.commit()
+    click.echo(f'{db.session.query(ShowListing).count()} listings rebuilt')
+
+
+@click.command('show-conflicts')
+@click.option('--upcoming', is_flag=True, help='Only report overlaps that have not ended yet.')
+@click.option('--limit', default=100, help='Stop listing after this many conflicts (0 for all).')
+@with_appcontext
+def show_conflicts(upcoming, limit):
+    """Report double-booked venues and artists.
+
+    Reads show once in start_time order; exits non-zero if any are found.
+    """
+    found = 0
+    for entity, entity_id, earlier_id, show_id, until in \
+            find_conflicts(since=datetime.today() if upcoming else None):
+        found += 1
+        if not limit or found <= limit:
+            click.echo(f'{entity} {entity_id}: show {show_id} overlaps show {earlier_id} until {until:%Y-%m-%d %H:%M}')
+    click.echo(f'{found} conflicts')
+    if found:
+        raise SystemExit(1)
+
+
+@click.command('geocode')
+@click.option('--all', 'everything', is_flag=True, help='Re-geocode venues that already have coordinates.')
+@click.option('--chunk-size', default=1000)
+@with_appcontext
+def geocode(everything, chunk_size):
+    """Fill in venue coordinates from the configured geocoder."""
+    query = db.session.query(Venue.id, Venue.address, Venue.city, Venue.state)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+    last_id = 0
+    placed = missed = 0
+    while True:
+        rows = query.filter(Venue.id > last_id).order_by(Venue.id).limit(chunk_size).all()
+        if not rows:
+            break
+        updates = [dict(locate(row.address, row.city, row.state), id=row.id) for row in rows]
+        # A miss leaves whatever coordinates the venue had.
+        updates = [update for update in updates if update['latitude'] is not None]
+        db.session.bulk_update_mappings(Venue, updates)
+        # Coordinates show on each venue's page and API resource.
+        record_change(*(f'venue:{update["id"]}' for update in updates))
+        db.session.commit()
+        placed += len(updates)
+        missed += len(rows) - len(updates)
+        last_id = rows[-1].id
+    if placed:
+        record_change('venues')
+        db.session.commit()
+    click.echo(f'{placed} venues placed, {missed} not found')
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates():
+    """Compile every template into the Jinja bytecode cache.
+
+    Run at deploy time so new workers start with warm bytecode.
+    """
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        raise click.ClickException('TEMPLATE_BYTECODE_CACHE is disabled.')
+    names = [name for name in env.list_templates() if name.endswith('.html')]
+    for name in names:
+        env.get_template(name)
+    click.echo(f'{len(names)} templates compiled')
+
+
+def register_commands(app):
+    app.cli.add_command(search_bench)
+    app.cli.add_command(db_advise)
+    app.cli.add_command(import_catalog)
+    app.cli.add_command(export_catalog)
+    app.cli.add_command(seed)
+    app.cli.add_command(bench)
+    app.cli.add_command(roll_summaries)
+    app.cli.add_command(rebuild_listings)
+    app.cli.add_command(compile_templates)
+    app.cli.add_command(show_conflicts)
+    app.cli.add_command(geocode)
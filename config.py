@@ -1,16 +1,92 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Settings below are defaults; create_app() overrides any of them from
+# FLASK_<NAME> environment variables.
+
+# Shared by every worker so sessions and CSRF tokens survive load balancing.
+# Required unless DEBUG is on, in which case a random per-process key is used.
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode with FLASK_DEBUG=1.
+DEBUG = False
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the server's
+# max_connections; DB_POOL_SIZE should match the worker's thread count.
+DB_POOL_SIZE = 4
+DB_MAX_OVERFLOW = 2
+DB_POOL_TIMEOUT = 10
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+
+# Read replicas for GET requests, e.g. ['postgresql://replica1/fyyur'].
+# A client reads from the primary for REPLICA_MAX_LAG seconds after its own
+# writes, and cache entries are not filled from replicas for that long after
+# a write to the data they hold.
+SQLALCHEMY_REPLICA_URIS = []
+REPLICA_MAX_LAG = 5
+
+# Async engine for the ASGI read path (asgi.py). Derived from
+# SQLALCHEMY_DATABASE_URI (asyncpg / aiosqlite) when unset.
+ASYNC_DATABASE_URI = None
+
+
+# Keyset pagination of the /shows listing
+SHOWS_PAGE_SIZE = 30
+SHOWS_MAX_PAGE_SIZE = 100
+
+# Venue/artist search: 'auto' picks the backend from the database dialect
+# (PostgreSQL full-text, SQLite FTS5, otherwise an in-process index that
+# each worker rebuilds after venue or artist changes).
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 100
+
+# Venue coordinates: 'gazetteer' looks up city centres offline in
+# GEOCODER_GAZETTEER; 'null' leaves venues unplaced. /venues/near radii are
+# in km.
+GEOCODER = 'gazetteer'
+GEOCODER_GAZETTEER = os.path.join(basedir, 'data', 'gazetteer.csv')
+NEAR_DEFAULT_RADIUS_KM = 25
+NEAR_MAX_RADIUS_KM = 500
+NEAR_MAX_RESULTS = 100
+
+# /shows/tour: most shows scheduled in one submission
+TOUR_MAX_DATES = 200
+
+# /api/v1/venues/available: most venues returned per request
+AVAILABILITY_MAX_RESULTS = 100
 
+# Serve show listings from the denormalized show_listing table instead of
+# joining show, artist and venue. Writes keep it current while this is on;
+# run flask rebuild-listings after turning it on.
+SHOW_LISTING_TABLE = False
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://postgres@localhost:5432/fyyur'
+# View-data cache: 'memory' (per-process LRU), 'redis', 'fakeredis' or 'null'.
+# Entries are keyed by the data's stored version, so every worker sees a
+# write as soon as it commits whichever backend is used; 'memory' just
+# keeps a copy per worker process, 'redis' one shared copy.
+CACHE_BACKEND = 'memory'
+CACHE_REDIS_URL = 'redis://localhost:6379/0'
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_MAX_ENTRIES = 10000
 
+# Show times in templates. Naive start times are displayed as stored unless
+# DATETIME_TIMEZONE is set, in which case they are taken as UTC and converted.
+DATETIME_LOCALE = 'en_US'
+DATETIME_TIMEZONE = None
+DATETIME_CACHE_SIZE = 4096
 
+# Templates: compiled bytecode is cached on disk (in a per-user temporary
+# directory unless TEMPLATE_BYTECODE_CACHE_DIR is set; warm it with
+# flask compile-templates), and listing tiles are cached per process.
+TEMPLATE_BYTECODE_CACHE = True
+TEMPLATE_BYTECODE_CACHE_DIR = None
+TEMPLATE_FRAGMENT_CACHE_SIZE = 20000
 
+# Log requests slower than this (with their SQL) as warnings; None disables.
+PROFILE_SLOW_REQUEST_MS = None
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from model import db, Venue, Artist, Genre, venue_genre, artist_genre
+from queries import listed_shows, show_listing_query, show_info
+
+BATCH_SIZE = 1000
+
+VENUE_FIELDS = ('id', 'name', 'city', 'state', 'genres', 'phone', 'address', 'website',
+                'image_link', 'facebook_link', 'seeking_talent', 'seeking_description')
+
+ARTIST_FIELDS = ('id', 'name', 'city', 'state', 'genres', 'phone', 'website',
+                 'image_link', 'facebook_link', 'seeking_venue', 'seeking_description')
+
+SHOW_FIELDS = ('artist_id', 'artist_name', 'artist_image_link', 'venue_id', 'venue_name',
+               'venue_image_link', 'start_time')
+
+
+def entity_rows(model, link, fields):
+    # Entities and their genre links are read by two server-side cursors in id
+    # order and merged, so genres cost no per-row query and memory stays flat.
+    entity_id = link.c[f'{model.__tablename__}_id']
+    links = db.session.query(entity_id, Genre.name).\
+        join(Genre, Genre.id == link.c.genre_id).\
+        order_by(entity_id, Genre.name).yield_per(BATCH_SIZE)
+    links = iter(links)
+    pending = next(links, None)
+
+    columns = [getattr(model, field) for field in fields if field != 'genres']
+    for row in db.session.query(*columns).order_by(model.id).yield_per(BATCH_SIZE):
+        record = dict(row._mapping)
+        genres = []
+        while pending is not None and pending[0] <= record['id']:
+            if pending[0] == record['id']:
+                genres.append(pending[1])
+            pending = next(links, None)
+        record['genres'] = genres
+        yield {field: record[field] for field in fields}
+
+
+def show_rows():
+    for row in show_listing_query().order_by(listed_shows().id).yield_per(BATCH_SIZE):
+        yield show_info(row)
+
+
+EXPORTS = {
+    'venues': (VENUE_FIELDS, lambda: entity_rows(Venue, venue_genre, VENUE_FIELDS)),
+    'artists': (ARTIST_FIELDS, lambda: entity_rows(Artist, artist_genre, ARTIST_FIELDS)),
+    'shows': (SHOW_FIELDS, show_rows),
+}
+
+
+def as_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+def as_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        if 'genres' in row:
+            row = dict(row, genres=','.join(row['genres']))
+        writer.writerow(row)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export(entity, fmt):
+    fields, rows = EXPORTS[entity]
+    if fmt == 'csv':
+        return as_csv(rows(), fields)
+    return as_jsonl(rows())
@@ -0,0 +1,75 @@
+from datetime import datetime
+from functools import lru_cache
+import dateutil.parser
+from babel import Locale
+from babel.dates import format_datetime, get_timezone, parse_pattern
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+# Date formatting for templates. Show data carries datetimes; the formatter
+# parses each pattern once for the configured locale and memoizes formatted
+# values, since a /shows page repeats the same few start times many times.
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+CLDR_FORMATS = ('short', 'long')
+
+
+class DateFormatter:
+
+    def __init__(self, locale='en_US', timezone=None, max_entries=4096):
+        self.locale = Locale.parse(locale)
+        # Start times are stored naive. Without a timezone they are shown as
+        # stored; with one they are taken as UTC and converted.
+        self.tzinfo = get_timezone(timezone) if timezone else None
+        self.pattern = lru_cache(maxsize=None)(self.compile)
+        self.format = lru_cache(maxsize=max_entries)(self.render)
+
+    def compile(self, format):
+        return parse_pattern(FORMATS.get(format, format))
+
+    def render(self, value, format):
+        if self.tzinfo is not None:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=get_timezone('UTC'))
+            value = value.astimezone(self.tzinfo)
+        if format in CLDR_FORMATS:
+            return format_datetime(value, format, tzinfo=value.tzinfo, locale=self.locale)
+        return self.pattern(format).apply(value, self.locale)
+
+    def __call__(self, value, format='medium'):
+        if value is None:
+            return ''
+        if isinstance(value, str):
+            # Cache entries written before show data carried datetimes.
+            value = dateutil.parser.parse(value)
+        return self.format(value, format)
+
+
+class JSONProvider(DefaultJSONProvider):
+    # Keep the API's '2100-01-01 20:00:00' start times rather than Flask's
+    # HTTP-date rendering of datetimes.
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, datetime):
+            return str(value)
+        return DefaultJSONProvider.default(value)
+
+
+def init_formatting(app):
+    formatter = DateFormatter(
+        app.config.get('DATETIME_LOCALE', 'en_US'),
+        app.config.get('DATETIME_TIMEZONE'),
+        app.config.get('DATETIME_CACHE_SIZE', 4096)
+    )
+    app.extensions['date_formatter'] = formatter
+    app.json = JSONProvider(app)
+    return formatter
+
+
+def get_date_formatter():
+    return current_app.extensions['date_formatter']
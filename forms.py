@@ -1,7 +1,15 @@
 from datetime import datetime
+import dateutil.parser
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, \
+    IntegerField, TextAreaField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange
+from model import Genre, SHOW_DEFAULT_DURATION, SHOW_MAX_DURATION
+
+
+def genre_choices():
+    return [(genre.name, genre.name) for genre in Genre.query.order_by(Genre.name)]
+
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +23,58 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[NumberRange(min=1, max=SHOW_MAX_DURATION)],
+        default=SHOW_DEFAULT_DURATION
+    )
+
+class TourForm(Form):
+    artist_id = StringField(
+        'artist_id', validators=[DataRequired()]
+    )
+    # One show per line: venue_id, start_time[, duration]
+    dates = TextAreaField(
+        'dates', validators=[DataRequired()]
+    )
+    duration = IntegerField(
+        'duration',
+        validators=[NumberRange(min=1, max=SHOW_MAX_DURATION)],
+        default=SHOW_DEFAULT_DURATION
+    )
+
+    def tour_dates(self):
+        # ({line: (venue_id, start_time, duration)}, {line: [problems]}) for
+        # the non-blank lines of the dates field.
+        dates = {}
+        problems = {}
+        for line, text in enumerate((self.dates.data or '').splitlines(), 1):
+            if not text.strip():
+                continue
+            fields = [field.strip() for field in text.split(',')]
+            if len(fields) not in (2, 3):
+                problems[line] = ['expected venue_id, start_time[, duration]']
+                continue
+            try:
+                venue_id = int(fields[0])
+            except ValueError:
+                problems[line] = [f'venue_id {fields[0]!r} is not a number']
+                continue
+            try:
+                start_time = dateutil.parser.parse(fields[1])
+            except (ValueError, OverflowError):
+                problems[line] = [f'start_time {fields[1]!r} is not a date and time']
+                continue
+            try:
+                duration = int(fields[2]) if len(fields) == 3 and fields[2] else \
+                    (self.duration.data or SHOW_DEFAULT_DURATION)
+            except ValueError:
+                duration = 0
+            if not 0 < duration <= SHOW_MAX_DURATION:
+                problems[line] = [f'duration must be 1 to {SHOW_MAX_DURATION} minutes']
+                continue
+            dates[line] = (venue_id, start_time, duration)
+        return dates, problems
 
 class VenueForm(Form):
     name = StringField(
@@ -90,27 +150,7 @@ class VenueForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[]
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -125,6 +165,10 @@ class VenueForm(Form):
         'seeking_description'
     )
 
+    def __init__(self, *args, genre_options=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.genres.choices = genre_options if genre_options is not None else genre_choices()
+
 class ArtistForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
@@ -196,27 +240,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[]
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -229,4 +253,8 @@ class ArtistForm(Form):
     )
     seeking_description = StringField(
         'seeking_description'
-    )
\ No newline at end of file
+    )
+
+    def __init__(self, *args, genre_options=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.genres.choices = genre_options if genre_options is not None else genre_choices()
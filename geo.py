@@ -0,0 +1,172 @@
+import csv
+import math
+from flask import current_app
+from sqlalchemy import and_, or_
+from model import db, Venue
+
+# Venue coordinates and proximity search. Venues store latitude/longitude
+# plus their geohash, a base32 string whose prefixes are ever smaller grid
+# cells; a btree index on it answers "venues in this cell" as a range scan
+# on any database. A radius search reads the few cells covering the circle's
+# bounding box and checks exact distances on what it finds.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+NEAR_FIRST_RADIUS_KM = 1
+
+
+def geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude.
+        span, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    # (height, width) in degrees of a geohash cell.
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=32):
+    # Geohash prefixes whose cells together contain every point within
+    # radius_km: the cells over the circle's bounding box, at the finest
+    # precision that needs no more than max_cells of them.
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = min(dlat / max(math.cos(math.radians(latitude)), 0.01), 180)
+    south, north = max(latitude - dlat, -90), min(latitude + dlat, 90 - 1e-9)
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        height, width = cell_size(precision)
+        if (math.floor(north / height) - math.floor(south / height) + 1) * \
+                (2 * dlon // width + 2) <= max_cells:
+            break
+        precision -= 1
+    height, width = cell_size(precision)
+    cells = set()
+    row = math.floor(south / height)
+    while row * height <= north:
+        lat = min(max(row * height + height / 2, south), north)
+        column = math.floor((longitude - dlon) / width)
+        while column * width <= longitude + dlon:
+            lon = (column * width + width / 2 + 180) % 360 - 180
+            cells.add(geohash(lat, lon, precision))
+            column += 1
+        row += 1
+    return sorted(cells)
+
+
+def in_cells(cells):
+    # '~' sorts after every base32 character, so each prefix is one range.
+    return or_(*[and_(Venue.geohash >= cell, Venue.geohash < cell + '~') for cell in cells])
+
+
+def near_query(latitude, longitude, radius_km):
+    # Venues in the cells covering the circle, a superset of those inside it.
+    return db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.address,
+                            Venue.image_link, Venue.latitude, Venue.longitude).\
+        filter(in_cells(covering_cells(latitude, longitude, radius_km)))
+
+
+def venues_near(latitude, longitude, radius_km, limit=20):
+    # The limit venues closest to the point within radius_km, nearest first.
+    # The search starts small and widens until it holds limit venues, which
+    # are then the nearest ones, so dense areas read few rows.
+    searched = min(radius_km, NEAR_FIRST_RADIUS_KM)
+    while True:
+        found = []
+        for row in near_query(latitude, longitude, searched):
+            distance = distance_km(latitude, longitude, row.latitude, row.longitude)
+            if distance <= searched:
+                found.append((distance, row))
+        if len(found) >= limit or searched >= radius_km:
+            break
+        searched = min(radius_km, searched * 4)
+    found.sort(key=lambda item: (item[0], item[1].id))
+    return [dict(row._mapping, distance_km=round(distance, 3)) for distance, row in found[:limit]]
+
+
+#  Geocoding
+#  ----------------------------------------------------------------
+
+class Geocoder:
+    # geocode() returns (latitude, longitude) or None when unknown.
+
+    def geocode(self, address, city, state):
+        return None
+
+
+class GazetteerGeocoder(Geocoder):
+    # Offline lookup of city centres from a CSV with city, state, latitude
+    # and longitude columns. Stands in for an address-level geocoding
+    # service; every venue in a city gets the same point.
+
+    def __init__(self, path):
+        self.places = {}
+        with open(path, newline='', encoding='utf-8') as source:
+            for row in csv.DictReader(source):
+                self.places[self.key(row['city'], row['state'])] = \
+                    (float(row['latitude']), float(row['longitude']))
+
+    @staticmethod
+    def key(city, state):
+        return ' '.join((city or '').split()).casefold(), (state or '').strip().upper()
+
+    def geocode(self, address, city, state):
+        return self.places.get(self.key(city, state))
+
+
+GEOCODERS = {
+    'gazetteer': lambda config: GazetteerGeocoder(config['GEOCODER_GAZETTEER']),
+    'null': lambda config: Geocoder(),
+}
+
+
+def init_geo(app):
+    geocoder = GEOCODERS[app.config.get('GEOCODER', 'gazetteer')](app.config)
+    app.extensions['geocoder'] = geocoder
+    return geocoder
+
+
+def get_geocoder():
+    return current_app.extensions['geocoder']
+
+
+def position(latitude, longitude):
+    # Venue column values for a point, or for no point.
+    if latitude is None or longitude is None:
+        return {'latitude': None, 'longitude': None, 'geohash': None}
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': geohash(latitude, longitude)}
+
+
+def locate(address, city, state):
+    return position(*(get_geocoder().geocode(address, city, state) or (None, None)))
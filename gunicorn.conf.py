@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = f'0.0.0.0:{os.environ.get("PORT", "5000")}'
+
+# One process per core plus threads for requests blocked on the database.
+# Each worker has its own connection pool (config.DB_POOL_SIZE, default 4,
+# to match the threads), so the server must allow
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Loading the app in each worker, after the fork, keeps the database pools
+# from sharing sockets between processes.
+preload_app = False
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth.
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+from sqlalchemy import func, insert
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm, genre_choices
+from model import db, Venue, Artist, Show, Genre, venue_genre, artist_genre
+from cache import record_change, show_tags
+from summary import refresh
+from listing import listings_enabled, refresh_listings
+from geo import locate
+
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n', 'none', 'null'}
+
+ENTITIES = {
+    'venue': {
+        'model': Venue,
+        'form': VenueForm,
+        'link': venue_genre,
+        'columns': ('name', 'city', 'state', 'address', 'phone', 'website', 'facebook_link',
+                    'image_link', 'seeking_talent', 'seeking_description'),
+        'flags': ('seeking_talent',),
+    },
+    'artist': {
+        'model': Artist,
+        'form': ArtistForm,
+        'link': artist_genre,
+        'columns': ('name', 'city', 'state', 'phone', 'website', 'facebook_link',
+                    'image_link', 'seeking_venue', 'seeking_description'),
+        'flags': ('seeking_venue',),
+    },
+    'show': {
+        'model': Show,
+        'form': ShowForm,
+        'link': None,
+        'columns': ('venue_id', 'artist_id', 'start_time', 'duration'),
+        'flags': (),
+    },
+}
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def formdata(row, spec):
+    data = MultiDict()
+    for key, value in row.items():
+        if key == 'genres':
+            if isinstance(value, str):
+                value = value.split(',')
+            for genre in value or ():
+                data.add('genres', genre.strip())
+        elif key in spec['flags']:
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data.add(key, 'y')
+        elif value is not None:
+            data.add(key, str(value))
+    return data
+
+
+class ImportState:
+    # Progress survives a crash in a JSON file: rows committed per entity and
+    # the source-ref -> database id map. A chunk is recorded as pending before
+    # its commit, so on resume we can tell from the database whether it landed.
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {'done': {}, 'ids': {'venue': {}, 'artist': {}}, 'pending': None}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def done(self, entity):
+        return self.data['done'].get(entity, 0)
+
+    def ids(self, entity):
+        return self.data['ids'].setdefault(entity, {})
+
+    def begin(self, entity, rows, first_id, refs):
+        self.data['pending'] = {'entity': entity, 'rows': rows, 'first_id': first_id, 'refs': refs}
+        self.save()
+
+    def commit(self):
+        pending = self.data['pending']
+        self.data['done'][pending['entity']] = self.done(pending['entity']) + pending['rows']
+        if pending['entity'] in ('venue', 'artist'):
+            self.ids(pending['entity']).update(pending['refs'])
+        self.data['pending'] = None
+        self.save()
+
+    def recover(self):
+        pending = self.data['pending']
+        if not pending:
+            return
+        model = ENTITIES[pending['entity']]['model']
+        landed = pending['first_id'] is not None and \
+            db.session.query(model.id).filter(model.id == pending['first_id']).first()
+        if landed:
+            self.commit()
+        else:
+            self.data['pending'] = None
+            self.save()
+
+
+def reserve_ids(model, count):
+    # Ids are assigned up front so link rows, the ref map and COPY can use
+    # them without a RETURNING round-trip.
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        sequence = f'{model.__tablename__}_id_seq'
+        return [row[0] for row in connection.exec_driver_sql(
+            f"SELECT nextval('{sequence}') FROM generate_series(1, {count})"
+        )]
+    start = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+    return list(range(start, start + count))
+
+
+def copy_rows(table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row[column] for column in columns)
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def bulk_insert(table, rows):
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        copy_rows(table.name, list(rows[0]), rows)
+    else:
+        connection.execute(insert(table), rows)
+
+
+class Importer:
+
+    def __init__(self, state, chunk_size=1000, report=print):
+        self.state = state
+        self.chunk_size = chunk_size
+        self.report = report
+        self.genre_options = genre_choices()
+        self.genre_ids = {name: id for id, name in db.session.query(Genre.id, Genre.name)}
+        self.errors = []
+
+    def validate(self, entity, spec, row, line):
+        data = formdata(row, spec)
+        if entity == 'show':
+            form = spec['form'](formdata=data, meta={'csrf': False})
+        else:
+            form = spec['form'](formdata=data, meta={'csrf': False}, genre_options=self.genre_options)
+        if not form.validate():
+            self.errors.append((entity, line, form.errors))
+            return None
+        values = {column: form.data[column] for column in spec['columns']}
+        if entity == 'venue':
+            values.update(locate(values['address'], values['city'], values['state']))
+        if entity == 'show':
+            for column, ref_entity in (('venue_id', 'venue'), ('artist_id', 'artist')):
+                ref = str(values[column] or '')
+                if ref not in self.state.ids(ref_entity):
+                    self.errors.append((entity, line, {column: [f'unknown {ref_entity} reference {ref!r}']}))
+                    return None
+                values[column] = self.state.ids(ref_entity)[ref]
+        else:
+            values['genres'] = form.genres.data
+        return values
+
+    @staticmethod
+    def changed_tags(entity, records):
+        if entity != 'show':
+            return [f'{entity}s'] if records else []
+        tags = set()
+        for record in records:
+            tags.update(show_tags(record['venue_id'], record['artist_id']))
+        return tags
+
+    def run(self, entity, rows):
+        spec = ENTITIES[entity]
+        model = spec['model']
+        table = model.__table__
+        self.state.recover()
+        read = skip = self.state.done(entity)
+        total = 0
+        started = time.perf_counter()
+
+        for chunk in chunked(islice(rows, skip, None), self.chunk_size):
+            records = []
+            refs = []
+            for line, row in enumerate(chunk, read + 1):
+                values = self.validate(entity, spec, row, line)
+                if values is not None:
+                    records.append(values)
+                    refs.append(str(row.get('id') or f'{entity}:{line}'))
+
+            ids = reserve_ids(model, len(records)) if records else []
+            links = []
+            for id, record in zip(ids, records):
+                record['id'] = id
+                for genre in record.pop('genres', ()):
+                    links.append({f'{entity}_id': id, 'genre_id': self.genre_ids[genre]})
+
+            self.state.begin(entity, len(chunk), ids[0] if ids else None, dict(zip(refs, ids)))
+            try:
+                bulk_insert(table, records)
+                if spec['link'] is not None:
+                    bulk_insert(spec['link'], links)
+                if entity == 'show':
+                    refresh('venue', [record['venue_id'] for record in records])
+                    refresh('artist', [record['artist_id'] for record in records])
+                    if listings_enabled():
+                        refresh_listings(ids)
+                record_change(*self.changed_tags(entity, records))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.state.data['pending'] = None
+                self.state.save()
+                raise
+            self.state.commit()
+
+            read += len(chunk)
+            total += len(records)
+            elapsed = time.perf_counter() - started
+            self.report(f'{entity}: {read} rows read, {total} inserted, '
+                        f'{total / elapsed if elapsed else 0:.0f} rows/sec')
+        return total
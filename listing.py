@@ -0,0 +1,103 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, insert, select
+from sqlalchemy.orm import Session
+from model import db, Venue, Artist, Show, ShowListing
+
+# Denormalized show listings (SHOW_LISTING_TABLE). show_listing holds each
+# show with the artist and venue names and images its tiles display, so
+# /shows and the detail pages read one table instead of joining three.
+# ORM writes keep it current from a flush hook: new or changed shows are
+# copied in, deleted ones dropped, and renaming an artist or venue (or
+# changing its image) rewrites all of its rows with one UPDATE on the
+# (artist_id|venue_id, start_time) index. Bulk loads, which bypass the ORM,
+# call refresh_listings() themselves; `flask rebuild-listings` fills the
+# table after the setting is turned on.
+
+LISTED = {
+    Venue: ('venue_id', {'name': 'venue_name', 'image_link': 'venue_image_link'}),
+    Artist: ('artist_id', {'name': 'artist_name', 'image_link': 'artist_image_link'}),
+}
+
+
+def listings_enabled():
+    return has_app_context() and current_app.config.get('SHOW_LISTING_TABLE', False)
+
+
+def listing_rows():
+    # show joined to its artist and venue, as show_listing rows.
+    return select(
+        Show.id,
+        Show.venue_id,
+        Show.artist_id,
+        Show.start_time,
+        Artist.name,
+        Artist.image_link,
+        Venue.name,
+        Venue.image_link
+    ).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+
+
+def refresh_listings(show_ids=None, session=None):
+    # Recopy the rows for show_ids (every row when show_ids is None) in the
+    # caller's transaction.
+    session = session or db.session
+    table = ShowListing.__table__
+    rows = listing_rows()
+    delete = table.delete()
+    if show_ids is not None:
+        show_ids = sorted({int(id) for id in show_ids if id is not None})
+        if not show_ids:
+            return
+        rows = rows.where(Show.id.in_(show_ids))
+        delete = delete.where(table.c.id.in_(show_ids))
+    session.execute(delete)
+    session.execute(insert(table).from_select(
+        ['id', 'venue_id', 'artist_id', 'start_time', 'artist_name', 'artist_image_link',
+         'venue_name', 'venue_image_link'], rows
+    ))
+
+
+def fan_out(entity, session=None):
+    # Copy a venue's or artist's display fields to every listing row of its
+    # shows; a popular artist's rename is one statement however many shows
+    # it has.
+    session = session or db.session
+    key, fields = LISTED[type(entity)]
+    table = ShowListing.__table__
+    session.execute(table.update().where(table.c[key] == entity.id).values(
+        {column: getattr(entity, field) for field, column in fields.items()}
+    ))
+
+
+def track_listings(session, flush_context):
+    # after_flush: the session still lists what was just written, and
+    # attribute history still shows what changed.
+    if not listings_enabled():
+        return
+    copied = []
+    dropped = []
+    for instance in session.new:
+        if isinstance(instance, Show):
+            copied.append(instance.id)
+    for instance in session.dirty:
+        if isinstance(instance, Show) and session.is_modified(instance, include_collections=False):
+            copied.append(instance.id)
+        elif type(instance) in LISTED:
+            state = inspect(instance)
+            if any(state.attrs[field].history.has_changes() for field in LISTED[type(instance)][1]):
+                fan_out(instance, session)
+    table = ShowListing.__table__
+    for instance in session.deleted:
+        if isinstance(instance, Show):
+            dropped.append(instance.id)
+        elif type(instance) in LISTED:
+            key, _ = LISTED[type(instance)]
+            session.execute(table.delete().where(table.c[key] == instance.id))
+    if dropped:
+        session.execute(table.delete().where(table.c.id.in_(dropped)))
+    refresh_listings(copied, session)
+
+
+def init_listing(app):
+    if not event.contains(Session, 'after_flush', track_listings):
+        event.listen(Session, 'after_flush', track_listings)
@@ -0,0 +1,75 @@
+from flask import current_app
+from cache import get_cache
+from model import db, Venue, Artist
+from queries import venues_with_upcoming_counts, group_venues_by_area, venue_detail, \
+    artist_detail, show_page, in_genre, next_transition, detail_transition
+
+# Cached view data shared by the HTML pages and the JSON API.
+
+
+def venue_areas(genre=None):
+    criterion = [in_genre(Venue, genre)] if genre else []
+    return get_cache().memoize(
+        'venues', lambda: group_venues_by_area(venues_with_upcoming_counts(*criterion)), genre,
+        expires=lambda data: next_transition()
+    )
+
+
+def venue_page(venue_id):
+    return get_cache().memoize(
+        f'venue:{venue_id}', lambda: venue_detail(venue_id), expires=detail_transition
+    )
+
+
+def artist_list(genre=None):
+    def load():
+        query = db.session.query(Artist.id, Artist.name)
+        if genre:
+            query = query.filter(in_genre(Artist, genre))
+        return [{'id': artist.id, 'name': artist.name} for artist in query.order_by(Artist.name)]
+
+    return get_cache().memoize('artists', load, genre)
+
+
+def artist_page(artist_id):
+    return get_cache().memoize(
+        f'artist:{artist_id}', lambda: artist_detail(artist_id), expires=detail_transition
+    )
+
+
+def show_page_args(args):
+    config = current_app.config
+    page_size = args.get('page_size', config['SHOWS_PAGE_SIZE'], type=int)
+    return {
+        'after': args.get('after'),
+        'before': args.get('before'),
+        'page_size': max(1, min(page_size, config['SHOWS_MAX_PAGE_SIZE'])),
+        'scope': 'all' if args.get('scope') == 'all' else 'upcoming'
+    }
+
+
+def shows_page(after=None, before=None, page_size=10, scope='upcoming'):
+    return get_cache().memoize(
+        'shows',
+        lambda: show_page(after=after, before=before, page_size=page_size,
+                          include_past=scope == 'all'),
+        after, before, page_size, scope,
+        expires=lambda page: next_transition() if scope == 'upcoming' else None
+    )
+
+
+def near_args(args):
+    # None unless lat and lon are a valid point.
+    config = current_app.config
+    latitude = args.get('lat', type=float)
+    longitude = args.get('lon', type=float)
+    if latitude is None or longitude is None or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return None
+    radius = args.get('radius', config['NEAR_DEFAULT_RADIUS_KM'], type=float)
+    limit = args.get('limit', 20, type=int)
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'radius_km': max(0.1, min(radius, config['NEAR_MAX_RADIUS_KM'])),
+        'limit': max(1, min(limit, config['NEAR_MAX_RESULTS'])),
+    }
@@ -0,0 +1,40 @@
+"""search indexes
+
+Revision ID: c3a9f1e2b7d4
+Revises: 64d9ab5d9701
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9f1e2b7d4'
+down_revision = '64d9ab5d9701'
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+    "coalesce(state, '') || ' ' || replace(coalesce(genres, ''), ',', ' '))"
+)
+
+
+def upgrade():
+    # Full-text and trigram indexes only exist on PostgreSQL; the SQLite
+    # backend keeps its own FTS5 tables (see search.py).
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin ({SEARCH_DOCUMENT})')
+        op.execute(f'CREATE INDEX ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('venue', 'artist'):
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_trgm')
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
@@ -0,0 +1,113 @@
+"""genre table
+
+Revision ID: d1f4b8a6c2e9
+Revises: c3a9f1e2b7d4
+Create Date: 2026-10-18 11:40:05.902713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f4b8a6c2e9'
+down_revision = 'c3a9f1e2b7d4'
+branch_labels = None
+depends_on = None
+
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+    "coalesce(state, ''))"
+)
+
+OLD_SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+    "coalesce(state, '') || ' ' || replace(coalesce(genres, ''), ',', ' '))"
+)
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_genre',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id', 'genre_id')
+        )
+        op.create_index(f'ix_{table}_genre_genre_id', f'{table}_genre', ['genre_id', f'{table}_id'])
+
+    # Backfill from the comma-joined columns, keeping any genre that is not in
+    # the form's original list.
+    bind = op.get_bind()
+    rows = {
+        table: bind.execute(sa.text(f'SELECT id, genres FROM {table} WHERE genres IS NOT NULL')).fetchall()
+        for table in ('venue', 'artist')
+    }
+    names = list(GENRES)
+    for table_rows in rows.values():
+        for _, genres in table_rows:
+            names.extend(name.strip() for name in genres.split(','))
+    names = [name for name in dict.fromkeys(names) if name]
+    op.bulk_insert(genre, [{'name': name} for name in names])
+    ids = dict((name, id) for id, name in bind.execute(sa.text('SELECT id, name FROM genre')))
+
+    for table, table_rows in rows.items():
+        link = sa.table(f'{table}_genre', sa.column(f'{table}_id'), sa.column('genre_id'))
+        links = {
+            (entity_id, ids[name.strip()])
+            for entity_id, genres in table_rows
+            for name in genres.split(',') if name.strip()
+        }
+        if links:
+            op.bulk_insert(link, [{f'{table}_id': entity_id, 'genre_id': genre_id} for entity_id, genre_id in links])
+
+    postgres = bind.dialect.name == 'postgresql'
+    for table in ('venue', 'artist'):
+        if postgres:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
+            op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin ({SEARCH_DOCUMENT})')
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+    if postgres:
+        op.execute('CREATE INDEX ix_genre_name_trgm ON genre USING gin (name gin_trgm_ops)')
+
+
+def downgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+    if postgres:
+        op.execute('DROP INDEX IF EXISTS ix_genre_name_trgm')
+    for table in ('venue', 'artist'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+        genres = {}
+        for entity_id, name in bind.execute(sa.text(
+            f'SELECT l.{table}_id, g.name FROM {table}_genre l JOIN genre g ON g.id = l.genre_id '
+            f'ORDER BY l.{table}_id, g.name'
+        )):
+            genres.setdefault(entity_id, []).append(name)
+        for entity_id, names in genres.items():
+            bind.execute(
+                sa.text(f'UPDATE {table} SET genres = :genres WHERE id = :id'),
+                {'genres': ','.join(names), 'id': entity_id}
+            )
+        if postgres:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
+            op.execute(f'CREATE INDEX ix_{table}_search ON {table} USING gin ({OLD_SEARCH_DOCUMENT})')
+        op.drop_index(f'ix_{table}_genre_genre_id', table_name=f'{table}_genre')
+        op.drop_table(f'{table}_genre')
+    op.drop_table('genre')
@@ -1,7 +1,60 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
 from datetime import datetime
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+
+def init_db(app):
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('postgres://'):
+        # Heroku-style URLs; SQLAlchemy 1.4 only accepts postgresql://.
+        uri = app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://' + uri[len('postgres://'):]
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    # SQLite gets Flask-SQLAlchemy's pool defaults; its pools take no sizing.
+    if make_url(uri).get_backend_name() != 'sqlite':
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', app.config['DB_POOL_PRE_PING'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    db.init_app(app)
+
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id', 'genre_id', 'artist_id')
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+    @classmethod
+    def from_names(cls, names):
+        # Existing genres only: the forms offer this table as their choices,
+        # so a made-up name from a POST must not become one. Raises
+        # LookupError naming the unknown ones.
+        names = [name for name in dict.fromkeys(names) if name]
+        if not names:
+            return []
+        existing = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+        unknown = [name for name in names if name not in existing]
+        if unknown:
+            raise LookupError(f'unknown genre {", ".join(map(repr, unknown))}')
+        return [existing[name] for name in names]
 
-db = SQLAlchemy()
 
 class Venue(db.Model):
     __tablename__ = 'venue'
@@ -10,7 +63,6 @@ class Venue(db.Model):
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
@@ -18,7 +70,16 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Maintained from latitude/longitude by geo.position().
+    geohash = db.Column(db.String(12), index=True)
+
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name', 'state', 'city', 'name'),
+    )
 
+    genres = db.relationship('Genre', secondary=venue_genre, lazy=True, order_by='Genre.name')
     shows = db.relationship('Show', backref='venues', lazy=True, cascade='all, delete-orphan')
     
 
@@ -32,15 +93,17 @@ class Venue(db.Model):
         return sorted(past_shows, key=lambda show: show.start_time)
 
 
-    def get_info_venue(self):
-        upcoming_shows = [show.get_info_show() for show in self.get_upcoming_shows()]
-        past_shows = [show.get_info_show() for show in self.get_past_shows()]
+    def get_info_venue(self, upcoming_shows=None, past_shows=None):
+        if upcoming_shows is None:
+            upcoming_shows = [show.get_info_show() for show in self.get_upcoming_shows()]
+        if past_shows is None:
+            past_shows = [show.get_info_show() for show in self.get_past_shows()]
         return {
             'id': self.id,
             'name': self.name,
             'city': self.city,
             'state': self.state,
-            'genres': self.genres.split(',') if self.genres else [],
+            'genres': [genre.name for genre in self.genres],
             'phone': self.phone,
             'address': self.address,
             'website': self.website,
@@ -48,6 +111,8 @@ class Venue(db.Model):
             'facebook_link': self.facebook_link,
             'seeking_talent': self.seeking_talent,
             'seeking_description': self.seeking_description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'upcoming_shows': upcoming_shows,
             'past_shows': past_shows,
             'upcoming_shows_count': len(upcoming_shows),
@@ -62,7 +127,6 @@ class Artist(db.Model):
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
@@ -70,6 +134,7 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
 
+    genres = db.relationship('Genre', secondary=artist_genre, lazy=True, order_by='Genre.name')
     shows = db.relationship('Show', backref='artists', lazy=True, cascade='all, delete-orphan')
 
     
@@ -83,15 +148,17 @@ class Artist(db.Model):
         return sorted(past_shows, key=lambda show: show.start_time) 
 
 
-    def get_info_artist(self):
-        upcoming_shows = [show.get_info_show() for show in self.get_upcoming_shows()]
-        past_shows = [show.get_info_show() for show in self.get_past_shows()]
+    def get_info_artist(self, upcoming_shows=None, past_shows=None):
+        if upcoming_shows is None:
+            upcoming_shows = [show.get_info_show() for show in self.get_upcoming_shows()]
+        if past_shows is None:
+            past_shows = [show.get_info_show() for show in self.get_past_shows()]
         return {
             'id': self.id,
             'name': self.name,
             'city': self.city,
             'state': self.state,
-            'genres': self.genres.split(',') if self.genres else [],
+            'genres': [genre.name for genre in self.genres],
             'phone': self.phone,
             'website': self.website,
             'image_link': self.image_link,
@@ -105,6 +172,12 @@ class Artist(db.Model):
           }
 
 
+# Show length in minutes. Booking checks rely on no show running longer
+# than SHOW_MAX_DURATION (see booking.py).
+SHOW_DEFAULT_DURATION = 120
+SHOW_MAX_DURATION = 24 * 60
+
+
 class Show(db.Model):
     __tablename__ = 'show'
 
@@ -112,6 +185,14 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'))
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'))
     start_time = db.Column(db.DateTime, nullable=False)
+    duration = db.Column(db.Integer, nullable=False, default=SHOW_DEFAULT_DURATION,
+                         server_default=str(SHOW_DEFAULT_DURATION))
+
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time'),
+    )
 
     venue = db.relationship('Venue')
     artist = db.relationship('Artist')
@@ -125,5 +206,87 @@ class Show(db.Model):
         'venue_id': self.venue_id,
         'venue_name': self.venue.name,
         'venue_image_link': self.venue.image_link,
-        'start_time': str(self.start_time)
-      }
\ No newline at end of file
+        'start_time': self.start_time
+      }
+
+
+class ShowListing(db.Model):
+    # A show with its artist's and venue's display fields copied in, so
+    # listings read one table without joins. Kept current by listing.py
+    # while SHOW_LISTING_TABLE is on.
+    __tablename__ = 'show_listing'
+
+    id = db.Column(db.Integer, db.ForeignKey('show.id', ondelete='CASCADE'), primary_key=True,
+                   autoincrement=False)
+    venue_id = db.Column(db.Integer)
+    artist_id = db.Column(db.Integer)
+    start_time = db.Column(db.DateTime, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_name = db.Column(db.String)
+    venue_image_link = db.Column(db.String(500))
+
+    __table_args__ = (
+        db.Index('ix_show_listing_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_listing_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_listing_start_time', 'start_time'),
+    )
+
+
+class VenueSummary(db.Model):
+    # Per-venue show aggregates, kept current by summary.py. A missing row
+    # means no shows.
+    __tablename__ = 'venue_summary'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show = db.Column(db.DateTime, index=True)
+
+
+class ArtistSummary(db.Model):
+    __tablename__ = 'artist_summary'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show = db.Column(db.DateTime, index=True)
+
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    tag = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+    @classmethod
+    def bump(cls, tags):
+        # Upsert in the caller's transaction, so a version only moves when the
+        # write it describes commits.
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        now = datetime.utcnow()
+        dialect = db.session.connection().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(cls.__table__).values(
+                [{'tag': tag, 'version': 1, 'updated_at': now} for tag in tags]
+            )
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['tag'],
+                set_={'version': cls.__table__.c.version + 1, 'updated_at': now}
+            ))
+            return
+        existing = {row.tag: row for row in cls.query.filter(cls.tag.in_(tags)).with_for_update()}
+        for tag in tags:
+            if tag in existing:
+                existing[tag].version += 1
+                existing[tag].updated_at = now
+            else:
+                db.session.add(cls(tag=tag, version=1, updated_at=now))
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import defaultdict
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = (
+    ('requests', 'fyyur_requests_total', 'Requests served.'),
+    ('sql_queries', 'fyyur_sql_queries_total', 'SQL statements executed.'),
+    ('sql_seconds', 'fyyur_sql_seconds_total', 'Time spent executing SQL.'),
+    ('sql_rows', 'fyyur_sql_rows_total', 'Rows returned by SQL queries, where the driver reports them.'),
+    ('template_seconds', 'fyyur_template_seconds_total', 'Time spent rendering templates.'),
+)
+
+
+class Metrics:
+    # Per-process aggregates keyed by endpoint; each worker exposes its own.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.seconds = defaultdict(float)
+
+    def observe(self, endpoint, profile, wall):
+        with self.lock:
+            counters = self.counters[endpoint]
+            counters['requests'] += 1
+            counters['sql_queries'] += profile['sql_queries']
+            counters['sql_seconds'] += profile['sql_seconds']
+            counters['sql_rows'] += profile['sql_rows']
+            counters['template_seconds'] += profile['template_seconds']
+            self.seconds[endpoint] += wall
+            buckets = self.buckets[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if wall <= bound:
+                    buckets[i] += 1
+
+    def render(self, cache_stats=None):
+        lines = []
+        with self.lock:
+            for key, name, help in COUNTERS:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} counter')
+                for endpoint, counters in sorted(self.counters.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {counters[key]:g}')
+            name = 'fyyur_request_duration_seconds'
+            lines.append(f'# HELP {name} Request wall time.')
+            lines.append(f'# TYPE {name} histogram')
+            for endpoint, buckets in sorted(self.buckets.items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound:g}"}} {count}')
+                total = self.counters[endpoint]['requests']
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {total:g}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {self.seconds[endpoint]:g}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {total:g}')
+        if cache_stats:
+            for key in ('hits', 'misses'):
+                lines.append(f'# TYPE fyyur_cache_{key}_total counter')
+                lines.append(f'fyyur_cache_{key}_total {cache_stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def current_profile():
+    if has_request_context():
+        return g.get('profile')
+    return None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    profile = current_profile()
+    if profile is None:
+        return
+    profile['sql_queries'] += 1
+    profile['sql_seconds'] += elapsed
+    # psycopg2 buffers a query's result and reports its size; sqlite3 reports
+    # -1 until the rows are fetched, so on SQLite this stays at zero. Writes
+    # are left out: their rowcount is rows changed, not rows read.
+    if cursor.description is not None and cursor.rowcount > 0:
+        profile['sql_rows'] += cursor.rowcount
+    if profile['statements'] is not None:
+        profile['statements'].append((elapsed, statement))
+
+
+def template_started(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile['template_start'].append(time.perf_counter())
+
+
+def template_finished(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None and profile['template_start']:
+        profile['template_seconds'] += time.perf_counter() - profile['template_start'].pop()
+
+
+def init_profiling(app):
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    slow_ms = app.config.get('PROFILE_SLOW_REQUEST_MS')
+
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.connect(template_started, app)
+    template_rendered.connect(template_finished, app)
+
+    @app.before_request
+    def start_profile():
+        g.profile = {
+            'start': time.perf_counter(),
+            'sql_queries': 0,
+            'sql_seconds': 0.0,
+            'sql_rows': 0,
+            'template_seconds': 0.0,
+            'template_start': [],
+            'statements': [] if slow_ms else None,
+        }
+
+    def finish(profile, endpoint, label):
+        wall = time.perf_counter() - profile['start']
+        metrics.observe(endpoint, profile, wall)
+        if slow_ms and wall * 1000 >= slow_ms:
+            statements = '\n'.join(
+                f'  {elapsed * 1000:8.2f} ms  {statement}' for elapsed, statement in profile['statements']
+            )
+            app.logger.warning(
+                f'Slow request {label} ({endpoint}): '
+                f'{wall * 1000:.1f} ms, {profile["sql_queries"]} queries, '
+                f'{profile["sql_seconds"] * 1000:.1f} ms SQL, {profile["sql_rows"]} rows, '
+                f'{profile["template_seconds"] * 1000:.1f} ms templates\n{statements}'
+            )
+
+    @app.after_request
+    def record_profile(response):
+        profile = g.get('profile')
+        if profile is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        label = f'{request.method} {request.full_path}'
+        if response.is_streamed:
+            # The body (and its queries and template time) is produced while
+            # the server sends it; stream_with_context keeps g.profile live
+            # until then, so record once the response is closed.
+            response.call_on_close(lambda: finish(profile, endpoint, label))
+        else:
+            g.pop('profile')
+            finish(profile, endpoint, label)
+        return response
+
+    return metrics
@@ -0,0 +1,278 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import and_, func, or_
+from model import db, Venue, Artist, Show, ShowListing, Genre, VenueSummary
+from summary import upcoming_count
+from booking import overlaps
+from listing import listings_enabled
+
+# Rows fetched per round trip when a listing is streamed.
+STREAM_BATCH_SIZE = 1000
+
+
+def in_genre(model, name):
+    # IN (subquery) rather than EXISTS so the planner drives the lookup from
+    # the (genre_id, entity_id) index instead of scanning the entity table.
+    link = model.genres.property.secondary
+    entity_id = link.c[f'{model.__tablename__}_id']
+    return model.id.in_(
+        db.session.query(entity_id).
+        join(Genre, Genre.id == link.c.genre_id).
+        filter(Genre.name == name)
+    )
+
+
+def venue_counts_query(*criterion, order_by=None):
+    # (city, state, id, name, num_upcoming_shows) per venue, with the count
+    # read from venue_summary rather than aggregated from show.
+    now = datetime.today()
+    query = db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        upcoming_count('venue', Venue.id, now).label('num_upcoming_shows')
+    ).outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id)
+
+    if criterion:
+        query = query.filter(*criterion)
+
+    if order_by is None:
+        order_by = (Venue.state, Venue.city, Venue.name)
+    return query.order_by(*order_by)
+
+
+def venues_with_upcoming_counts(*criterion, order_by=None):
+    return venue_counts_query(*criterion, order_by=order_by).all()
+
+
+def group_venues_by_area(rows):
+    areas = []
+    prev_city = None
+    prev_state = None
+
+    for row in rows:
+        if row.city != prev_city or row.state != prev_state:
+            areas.append(
+                {'city': row.city, 'state': row.state, 'venues': []}
+            )
+        areas[-1]['venues'].append(
+            {
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.num_upcoming_shows
+            }
+        )
+        prev_city = row.city
+        prev_state = row.state
+
+    return areas
+
+
+def stream_venue_areas(*criterion):
+    # group_venues_by_area() over a server-side cursor: areas and their
+    # venues are produced lazily and must be consumed in order.
+    rows = venue_counts_query(*criterion).yield_per(STREAM_BATCH_SIZE)
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+            'city': city,
+            'state': state,
+            'venues': ({'id': row.id, 'name': row.name, 'num_upcoming_shows': row.num_upcoming_shows}
+                       for row in venues)
+        }
+
+
+def available_venues(start_time, end, city=None, state=None, genre=None,
+                     seeking_talent=None, limit=50):
+    # Venues with no show overlapping [start_time, end): an anti-join whose
+    # inner side is a (venue_id, start_time) index range per venue.
+    booked = db.session.query(Show.id).\
+        filter(Show.venue_id == Venue.id, overlaps(start_time, end)).exists()
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.image_link).\
+        filter(~booked)
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+    if genre:
+        query = query.filter(in_genre(Venue, genre))
+    if seeking_talent is not None:
+        query = query.filter(Venue.seeking_talent.is_(seeking_talent))
+    return query.order_by(Venue.name, Venue.id).limit(limit)
+
+
+def listed_shows():
+    # The model listings filter and order on (id, venue_id, artist_id,
+    # start_time): show_listing when it is kept (SHOW_LISTING_TABLE),
+    # otherwise show itself.
+    return ShowListing if listings_enabled() else Show
+
+
+def show_listing_query(*criterion, now=None):
+    # Shows with their artist and venue display fields, flagged as
+    # upcoming/past against a single timestamp. Criteria and ordering should
+    # use the columns of listed_shows().
+    if now is None:
+        now = datetime.today()
+    shows = listed_shows()
+    if shows is ShowListing:
+        query = db.session.query(
+            ShowListing.id,
+            ShowListing.artist_id,
+            ShowListing.artist_name,
+            ShowListing.artist_image_link,
+            ShowListing.venue_id,
+            ShowListing.venue_name,
+            ShowListing.venue_image_link,
+            ShowListing.start_time,
+            (ShowListing.start_time >= now).label('upcoming')
+        )
+    else:
+        query = db.session.query(
+            Show.id,
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Venue.image_link.label('venue_image_link'),
+            Show.start_time,
+            (Show.start_time >= now).label('upcoming')
+        ).join(Artist, Show.artist_id == Artist.id).\
+            join(Venue, Show.venue_id == Venue.id)
+
+    if criterion:
+        query = query.filter(*criterion)
+    return query
+
+
+def show_info(row):
+    return {
+        'artist_id': row.artist_id,
+        'artist_name': row.artist_name,
+        'artist_image_link': row.artist_image_link,
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'venue_image_link': row.venue_image_link,
+        'start_time': row.start_time
+    }
+
+
+def partition_shows(*criterion):
+    now = datetime.today()
+    shows = listed_shows()
+    rows = show_listing_query(*criterion, now=now).\
+        order_by((shows.start_time >= now).desc(), shows.start_time, shows.id).all()
+    upcoming_shows = []
+    past_shows = []
+    for row in rows:
+        (upcoming_shows if row.upcoming else past_shows).append(show_info(row))
+    return upcoming_shows, past_shows
+
+
+def venue_detail(venue_id):
+    venue = Venue.query.get(venue_id)
+    if venue is None:
+        return None
+    upcoming_shows, past_shows = partition_shows(listed_shows().venue_id == venue_id)
+    return venue.get_info_venue(upcoming_shows, past_shows)
+
+
+def artist_detail(artist_id):
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        return None
+    upcoming_shows, past_shows = partition_shows(listed_shows().artist_id == artist_id)
+    return artist.get_info_artist(upcoming_shows, past_shows)
+
+
+def next_transition(*criterion):
+    # Earliest upcoming start_time: the moment an upcoming/past split or an
+    # upcoming count computed now stops being correct. One index lookup on
+    # (start_time) or (venue_id|artist_id, start_time).
+    return db.session.query(func.min(Show.start_time)).\
+        filter(Show.start_time >= datetime.today(), *criterion).scalar()
+
+
+def detail_transition(data):
+    # Detail pages already carry their upcoming shows in start order.
+    if not data['upcoming_shows']:
+        return None
+    return data['upcoming_shows'][0]['start_time']
+
+
+def encode_cursor(start_time, show_id):
+    token = f'{start_time.isoformat()}|{show_id}'.encode()
+    return urlsafe_b64encode(token).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        start_time, show_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def show_page_query(after=None, before=None, page_size=10, include_past=False):
+    # Keyset pagination over (start_time, id): each page is one joined query
+    # bounded by LIMIT, whatever the size of the show table.
+    now = datetime.today()
+    shows = listed_shows()
+    query = show_listing_query(now=now)
+    if not include_past:
+        query = query.filter(shows.start_time >= now)
+
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    if before:
+        start_time, show_id = before
+        query = query.filter(or_(
+            shows.start_time < start_time,
+            and_(shows.start_time == start_time, shows.id < show_id)
+        )).order_by(shows.start_time.desc(), shows.id.desc())
+    else:
+        if after:
+            start_time, show_id = after
+            query = query.filter(or_(
+                shows.start_time > start_time,
+                and_(shows.start_time == start_time, shows.id > show_id)
+            ))
+        query = query.order_by(shows.start_time, shows.id)
+    return query.limit(page_size + 1)
+
+
+def show_page_result(rows, after=None, before=None, page_size=10):
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    has_next = has_more if not before else True
+    has_prev = has_more if before else bool(after)
+    return {
+        'shows': [show_info(row) for row in rows],
+        'next_cursor': encode_cursor(rows[-1].start_time, rows[-1].id) if rows and has_next else None,
+        'prev_cursor': encode_cursor(rows[0].start_time, rows[0].id) if rows and has_prev else None
+    }
+
+
+def stream_shows(include_past=False):
+    # The whole /shows listing, unpaginated, over a server-side cursor.
+    now = datetime.today()
+    shows = listed_shows()
+    query = show_listing_query(now=now)
+    if not include_past:
+        query = query.filter(shows.start_time >= now)
+    for row in query.order_by(shows.start_time, shows.id).yield_per(STREAM_BATCH_SIZE):
+        yield show_info(row)
+
+
+def show_page(after=None, before=None, page_size=10, include_past=False):
+    rows = show_page_query(after, before, page_size, include_past).all()
+    return show_page_result(rows, after, before, page_size)
@@ -0,0 +1,75 @@
+import random
+import time
+from flask import g, has_app_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.orm import Session
+
+# Read-replica routing. SQLALCHEMY_REPLICA_URIS become binds named
+# replica0, replica1, ...; GET/HEAD requests pick one of them for all their
+# reads, everything else (POST handlers, CLI commands, flushes) uses the
+# primary. A client that just committed reads from the primary for
+# REPLICA_MAX_LAG seconds so it sees its own writes.
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = current_replica()
+        if replica is not None and not self._flushing:
+            return get_state(self.app).db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def current_replica():
+    return g.get('replica') if has_app_context() else None
+
+
+def replica_may_lag(since_ns):
+    # True when this request reads from a replica that may not yet have the
+    # write made at since_ns (a time.time_ns() timestamp).
+    if current_replica() is None:
+        return False
+    lag = g.replica_max_lag
+    return time.time_ns() - since_ns < lag * 1e9
+
+
+def mark_committed(session):
+    if has_app_context():
+        g.committed = True
+
+
+def init_routing(app):
+    replicas = list(app.config.get('SQLALCHEMY_REPLICA_URIS') or ())
+    if not replicas:
+        return []
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    names = []
+    for i, uri in enumerate(replicas):
+        names.append(f'replica{i}')
+        binds[names[-1]] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+    max_lag = app.config.get('REPLICA_MAX_LAG', 5)
+
+    if not event.contains(Session, 'after_commit', mark_committed):
+        event.listen(Session, 'after_commit', mark_committed)
+
+    @app.before_request
+    def choose_bind():
+        g.replica_max_lag = max_lag
+        if request.method in ('GET', 'HEAD') and session.get('read_primary_until', 0) <= time.time():
+            g.replica = random.choice(names)
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('committed'):
+            session['read_primary_until'] = time.time() + max_lag
+        return response
+
+    return names
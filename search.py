@@ -0,0 +1,302 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import func, or_, select, text, union
+from sqlalchemy.engine.url import make_url
+from model import db, Genre
+from cache import stored_version
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_FIELDS = ('name', 'city', 'state', 'genres')
+
+
+def tokenize(value):
+    return TOKEN_RE.findall((value or '').lower())
+
+
+def document(entity):
+    doc = {field: getattr(entity, field) or '' for field in SEARCH_FIELDS[:-1]}
+    doc['genres'] = ' '.join(genre.name for genre in entity.genres)
+    return doc
+
+
+def genre_link_table(model):
+    return model.genres.property.secondary
+
+
+class SearchBackend:
+    # Returns entity ids ordered by relevance. An empty term lists entities
+    # by name, as the old ILIKE '%%' search did.
+
+    def __init__(self, max_results=100):
+        self.max_results = max_results
+
+    def search(self, model, term):
+        tokens = tokenize(term)
+        if not tokens:
+            rows = db.session.query(model.id).order_by(model.name).\
+                limit(self.max_results).all()
+            return [row.id for row in rows]
+        return self.match(model, term, tokens)
+
+    def match(self, model, term, tokens):
+        raise NotImplementedError
+
+    def index(self, entity):
+        pass
+
+    def remove(self, model, entity_id):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    # Ranked tsvector match over name/city/state, trigram-backed substring
+    # match on the name and a genre match through the genre link table. All
+    # are answered from indexes created by migrations, so index() and
+    # remove() have nothing to do.
+
+    @staticmethod
+    def document_expr(model):
+        return func.to_tsvector(
+            text("'simple'"),
+            func.coalesce(model.name, '') + ' ' +
+            func.coalesce(model.city, '') + ' ' +
+            func.coalesce(model.state, '')
+        )
+
+    def match_query(self, model, term, tokens):
+        doc = self.document_expr(model)
+        query = func.to_tsquery(text("'simple'"), ' & '.join(f'{token}:*' for token in tokens))
+        link = genre_link_table(model)
+        entity_id = link.c[f'{model.__tablename__}_id']
+        # One id list per index (tsvector GIN, name trigram GIN, genre link),
+        # combined with UNION: OR-ing the three predicates, one of them a
+        # correlated EXISTS, would scan the whole entity table instead.
+        matched = union(
+            select(model.id).where(doc.op('@@')(query)),
+            select(model.id).where(model.name.ilike(f'%{term}%')),
+            select(entity_id).join(Genre, Genre.id == link.c.genre_id).
+            where(or_(*(Genre.name.ilike(f'{token}%') for token in tokens)))
+        )
+        rank = func.ts_rank(doc, query) + func.similarity(model.name, term)
+        return db.session.query(model.id).\
+            filter(model.id.in_(matched)).\
+            order_by(rank.desc(), model.name).\
+            limit(self.max_results)
+
+    def match(self, model, term, tokens):
+        return [row.id for row in self.match_query(model, term, tokens)]
+
+
+class SqliteSearchBackend(SearchBackend):
+    # One FTS5 table per entity, keyed by the entity id as rowid. Tables are
+    # created and backfilled lazily the first time they are used.
+
+    def __init__(self, max_results=100):
+        super().__init__(max_results)
+        self.ready = set()
+
+    @staticmethod
+    def table(model):
+        return f'{model.__tablename__}_fts'
+
+    def ensure(self, model):
+        if model in self.ready:
+            return
+        table = self.create_table(model)
+        indexed = db.session.execute(text(f'SELECT count(*) FROM {table}')).scalar()
+        if not indexed and db.session.query(model.id).first():
+            self.rebuild(model)
+        db.session.commit()
+        self.ready.add(model)
+
+    def create_table(self, model):
+        table = self.table(model)
+        db.session.execute(text(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+            f'USING fts5({", ".join(SEARCH_FIELDS)}, tokenize="unicode61")'
+        ))
+        return table
+
+    def match(self, model, term, tokens):
+        self.ensure(model)
+        table = self.table(model)
+        expr = ' '.join(f'"{token}"*' for token in tokens)
+        rows = db.session.execute(
+            text(f'SELECT rowid FROM {table} WHERE {table} MATCH :expr '
+                 f'ORDER BY bm25({table}) LIMIT :limit'),
+            {'expr': expr, 'limit': self.max_results}
+        )
+        return [row[0] for row in rows]
+
+    def index(self, entity):
+        model = type(entity)
+        self.ensure(model)
+        self.remove(model, entity.id)
+        table = self.table(model)
+        db.session.execute(
+            text(f'INSERT INTO {table} (rowid, {", ".join(SEARCH_FIELDS)}) '
+                 f'VALUES (:id, {", ".join(":" + field for field in SEARCH_FIELDS)})'),
+            dict(document(entity), id=entity.id)
+        )
+        db.session.commit()
+
+    def remove(self, model, entity_id):
+        self.ensure(model)
+        db.session.execute(
+            text(f'DELETE FROM {self.table(model)} WHERE rowid = :id'),
+            {'id': entity_id}
+        )
+        db.session.commit()
+
+    def rebuild(self, model):
+        table = self.create_table(model)
+        entity = model.__tablename__
+        link = genre_link_table(model).name
+        db.session.execute(text(f'DELETE FROM {table}'))
+        db.session.execute(text(
+            f'INSERT INTO {table} (rowid, {", ".join(SEARCH_FIELDS)}) '
+            f'SELECT e.id, e.name, e.city, e.state, '
+            f"(SELECT group_concat(g.name, ' ') FROM {link} l JOIN genre g ON g.id = l.genre_id "
+            f'WHERE l.{entity}_id = e.id) '
+            f'FROM {entity} e'
+        ))
+
+
+class MemorySearchBackend(SearchBackend):
+    # In-process inverted index for engines with no native full-text search.
+    # Prefix lookups bisect a sorted token list; rank is the number of query
+    # tokens matched, with a bonus for matches on the name. Each worker has
+    # its own index and only sees its own writes directly, so it is rebuilt
+    # whenever the venues/artists data version has moved since it was built.
+
+    def __init__(self, max_results=100):
+        super().__init__(max_results)
+        self.postings = {}
+        self.terms = {}
+        self.names = {}
+        self.vocabulary = {}
+        self.versions = {}
+
+    @staticmethod
+    def data_version(model):
+        return stored_version(f'{model.__tablename__}s')[0]
+
+    def ensure(self, model):
+        version = self.data_version(model)
+        if model not in self.postings or self.versions[model] != version:
+            self.rebuild(model, version)
+
+    def match(self, model, term, tokens):
+        self.ensure(model)
+        postings = self.postings[model]
+        names = self.names[model]
+        vocabulary = self.vocabulary.get(model)
+        if vocabulary is None:
+            vocabulary = self.vocabulary[model] = sorted(postings)
+        scores = None
+
+        for token in tokens:
+            token_scores = defaultdict(int)
+            i = bisect_left(vocabulary, token)
+            while i < len(vocabulary) and vocabulary[i].startswith(token):
+                for entity_id in postings[vocabulary[i]]:
+                    token_scores[entity_id] += 1
+                i += 1
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {entity_id: scores[entity_id] + score
+                          for entity_id, score in token_scores.items()
+                          if entity_id in scores}
+            if not scores:
+                return []
+
+        name_tokens = {entity_id: tokenize(names[entity_id]) for entity_id in scores}
+        ranked = sorted(
+            scores,
+            key=lambda entity_id: (
+                -scores[entity_id] - sum(
+                    1 for token in tokens
+                    if any(name_token.startswith(token) for name_token in name_tokens[entity_id])
+                ),
+                names[entity_id]
+            )
+        )
+        return ranked[:self.max_results]
+
+    def index(self, entity):
+        model = type(entity)
+        self.ensure(model)
+        self.remove(model, entity.id)
+        self.add(model, entity.id, document(entity))
+
+    def add(self, model, entity_id, doc):
+        postings = self.postings[model]
+        terms = {token for field in SEARCH_FIELDS for token in tokenize(doc[field])}
+        for token in terms:
+            postings.setdefault(token, set()).add(entity_id)
+        self.terms[model][entity_id] = terms
+        self.names[model][entity_id] = doc['name']
+        self.vocabulary.pop(model, None)
+
+    def remove(self, model, entity_id):
+        self.ensure(model)
+        postings = self.postings[model]
+        for token in self.terms[model].pop(entity_id, ()):
+            postings[token].discard(entity_id)
+            if not postings[token]:
+                del postings[token]
+        self.names[model].pop(entity_id, None)
+        self.vocabulary.pop(model, None)
+
+    def rebuild(self, model, version=None):
+        # The version is read before the rows, so a write that lands during
+        # the rebuild triggers another one.
+        self.versions[model] = self.data_version(model) if version is None else version
+        self.postings[model] = {}
+        self.terms[model] = {}
+        self.names[model] = {}
+        self.vocabulary.pop(model, None)
+        link = genre_link_table(model)
+        entity_id = link.c[f'{model.__tablename__}_id']
+        genres = defaultdict(list)
+        for row in db.session.query(entity_id, Genre.name).join(Genre, Genre.id == link.c.genre_id):
+            genres[row[0]].append(row[1])
+
+        columns = [getattr(model, field) for field in SEARCH_FIELDS[:-1]]
+        for row in db.session.query(model.id, *columns).yield_per(1000):
+            doc = dict(zip(SEARCH_FIELDS, row[1:]))
+            doc['genres'] = ' '.join(genres.get(row.id, ()))
+            self.add(model, row.id, doc)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+    'memory': MemorySearchBackend,
+}
+
+
+def init_search(app):
+    # SEARCH_BACKEND is 'auto' (pick from the database dialect) or a key of
+    # BACKENDS.
+    name = app.config.get('SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        dialect = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        name = {'postgres': 'postgresql'}.get(dialect, dialect)
+        if name not in BACKENDS:
+            name = 'memory'
+    backend = BACKENDS[name](max_results=app.config.get('SEARCH_MAX_RESULTS', 100))
+    app.extensions['search'] = backend
+    return backend
+
+
+def search_backend():
+    return current_app.extensions['search']
+
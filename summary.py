@@ -0,0 +1,109 @@
+from datetime import datetime
+from sqlalchemy import case, func, insert, select
+from model import db, Show, VenueSummary, ArtistSummary
+
+# Upcoming/past show counts and next show time per venue and per artist.
+# Writes keep them current: a new show adjusts its two rows in place, while
+# deletes and bulk loads recompute the rows they touched from show, which
+# the (venue_id|artist_id, start_time) indexes answer without a scan. As
+# time passes, upcoming shows become past ones; roll() recomputes the rows
+# whose next show has started and should run every minute or so (flask
+# roll-summaries). Readers must not trust a row whose next_show is in the
+# past before it has been rolled; see upcoming_count().
+
+SUMMARIES = {
+    'venue': (VenueSummary, VenueSummary.venue_id, Show.venue_id),
+    'artist': (ArtistSummary, ArtistSummary.artist_id, Show.artist_id),
+}
+
+
+def refresh(entity, ids=None):
+    # Recompute the rows for ids (all rows when ids is None) in the
+    # caller's transaction.
+    model, key, show_key = SUMMARIES[entity]
+    if ids is not None:
+        ids = sorted({int(id) for id in ids if id is not None})
+        if not ids:
+            return
+    now = datetime.today()
+    aggregates = select(
+        show_key,
+        func.sum(case((Show.start_time >= now, 1), else_=0)),
+        func.sum(case((Show.start_time < now, 1), else_=0)),
+        func.min(case((Show.start_time >= now, Show.start_time)))
+    ).where(show_key.isnot(None)).group_by(show_key)
+    delete = model.__table__.delete()
+    if ids is not None:
+        aggregates = aggregates.where(show_key.in_(ids))
+        delete = delete.where(key.in_(ids))
+    db.session.execute(delete)
+    db.session.execute(insert(model.__table__).from_select(
+        [key.name, 'upcoming_shows_count', 'past_shows_count', 'next_show'], aggregates
+    ))
+
+
+def add_show(venue_id, artist_id, start_time):
+    # Ids may come straight from form data.
+    upcoming = start_time >= datetime.today()
+    dialect = db.session.connection().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        refresh('venue', [venue_id])
+        refresh('artist', [artist_id])
+        return
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    for entity, id in (('venue', venue_id), ('artist', artist_id)):
+        model, key, _ = SUMMARIES[entity]
+        statement = upsert(model.__table__).values({
+            key.name: int(id),
+            'upcoming_shows_count': int(upcoming),
+            'past_shows_count': int(not upcoming),
+            'next_show': start_time if upcoming else None,
+        })
+        table = model.__table__.c
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[key.name],
+            set_={
+                'upcoming_shows_count': table.upcoming_shows_count + statement.excluded.upcoming_shows_count,
+                'past_shows_count': table.past_shows_count + statement.excluded.past_shows_count,
+                'next_show': case(
+                    (statement.excluded.next_show.is_(None), table.next_show),
+                    (table.next_show.is_(None), statement.excluded.next_show),
+                    (statement.excluded.next_show < table.next_show, statement.excluded.next_show),
+                    else_=table.next_show
+                ),
+            }
+        ))
+
+
+def played_at(venue_id):
+    # Artists whose summaries change when the venue's shows are deleted.
+    return [artist_id for artist_id, in
+            db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+
+def roll(now=None):
+    # Recompute the rows whose next upcoming show has started; an index
+    # range scan on next_show finds them.
+    now = now or datetime.today()
+    rolled = 0
+    for entity, (model, key, _) in SUMMARIES.items():
+        ids = [id for id, in db.session.query(key).filter(model.next_show < now)]
+        refresh(entity, ids)
+        rolled += len(ids)
+    return rolled
+
+
+def upcoming_count(entity, entity_id, now):
+    # Upcoming shows of entity_id (a column) from its summary row, counted
+    # from show only for the rare rows that are due to be rolled.
+    model, _, show_key = SUMMARIES[entity]
+    counted = select(func.count(Show.id)).\
+        where(show_key == entity_id, Show.start_time >= now).scalar_subquery()
+    return case(
+        (model.next_show.is_(None), func.coalesce(model.upcoming_shows_count, 0)),
+        (model.next_show >= now, model.upcoming_shows_count),
+        else_=counted
+    )
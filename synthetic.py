@@ -0,0 +1,162 @@
+import math
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+from model import db, Venue, Artist, Show, Genre, venue_genre, artist_genre
+from importer import reserve_ids, bulk_insert
+from cache import record_change
+from search import search_backend
+from summary import refresh
+from listing import listings_enabled, refresh_listings
+from geo import get_geocoder, position
+
+# (city, state, relative weight) - larger markets get more venues and artists.
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 25), ('Chicago', 'IL', 16),
+    ('Nashville', 'TN', 14), ('Austin', 'TX', 13), ('San Francisco', 'CA', 12),
+    ('Seattle', 'WA', 10), ('Atlanta', 'GA', 9), ('New Orleans', 'LA', 9),
+    ('Boston', 'MA', 8), ('Denver', 'CO', 8), ('Philadelphia', 'PA', 7),
+    ('Portland', 'OR', 7), ('Minneapolis', 'MN', 6), ('Detroit', 'MI', 6),
+    ('Houston', 'TX', 6), ('Miami', 'FL', 6), ('Washington', 'DC', 5),
+    ('Memphis', 'TN', 5), ('Kansas City', 'MO', 4), ('Phoenix', 'AZ', 4),
+    ('Salt Lake City', 'UT', 3), ('Columbus', 'OH', 3), ('Las Vegas', 'NV', 3),
+    ('Baltimore', 'MD', 3), ('Charlotte', 'NC', 2), ('Albuquerque', 'NM', 2),
+    ('Richmond', 'VA', 2), ('Burlington', 'VT', 1), ('Anchorage', 'AK', 1),
+]
+
+GENRES = [
+    ('Rock n Roll', 20), ('Pop', 16), ('Hip-Hop', 14), ('Jazz', 10), ('Electronic', 10),
+    ('Country', 9), ('R&B', 8), ('Alternative', 8), ('Blues', 6), ('Folk', 6), ('Punk', 5),
+    ('Soul', 5), ('Heavy Metal', 5), ('Reggae', 4), ('Funk', 4), ('Classical', 3),
+    ('Instrumental', 3), ('Musical Theatre', 2), ('Other', 2),
+]
+
+VENUE_WORDS = ['Hall', 'Room', 'Lounge', 'Theatre', 'Club', 'Ballroom', 'Tavern', 'Stage', 'Garden', 'Cellar']
+NAME_WORDS = ['Blue', 'Golden', 'Electric', 'Velvet', 'Midnight', 'Crimson', 'Silver', 'Wild',
+              'Lucky', 'Northern', 'Broken', 'Neon', 'Iron', 'Quiet', 'Rolling', 'Painted']
+ARTIST_WORDS = ['Foxes', 'Echoes', 'Kings', 'Riders', 'Sisters', 'Collective', 'Orchestra',
+                'Trio', 'Band', 'Machine', 'Ghosts', 'Hearts', 'Union', 'Parade']
+
+
+def reset_database():
+    # Empties every table but keeps the schema, including the indexes that
+    # only migrations create.
+    tables = db.metadata.sorted_tables
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(
+            f'TRUNCATE {", ".join(table.name for table in tables)} RESTART IDENTITY CASCADE'
+        )
+    else:
+        for table in reversed(tables):
+            connection.execute(table.delete())
+    db.session.commit()
+
+
+class Generator:
+
+    def __init__(self, seed=0, chunk_size=10000, report=print):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.report = report
+
+    def genres(self):
+        existing = {name for name, in db.session.query(Genre.name)}
+        db.session.add_all(Genre(name=name) for name, _ in GENRES if name not in existing)
+        db.session.commit()
+        ids = {name: id for id, name in db.session.query(Genre.id, Genre.name)}
+        return [ids[name] for name, _ in GENRES], [weight for _, weight in GENRES]
+
+    def pick_genres(self, genre_ids, weights):
+        count = self.rng.choice((1, 1, 2, 2, 3))
+        return set(self.rng.choices(genre_ids, weights, k=count))
+
+    def place(self, city, state):
+        # Spread venues around their city centre (sigma ~5 km) so proximity
+        # searches have something to rank.
+        centre = get_geocoder().geocode(None, city, state)
+        if centre is None:
+            return position(None, None)
+        latitude, longitude = centre
+        return position(latitude + self.rng.gauss(0, 0.045),
+                        longitude + self.rng.gauss(0, 0.045 / math.cos(math.radians(latitude))))
+
+    def entities(self, model, link, count, genre_ids, weights):
+        entity = model.__tablename__
+        cities, city_weights = CITIES, [weight for _, _, weight in CITIES]
+        created = []
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            ids = reserve_ids(model, size)
+            rows = []
+            links = []
+            for id in ids:
+                city, state, _ = self.rng.choices(cities, city_weights)[0]
+                name = f'{self.rng.choice(NAME_WORDS)} {self.rng.choice(VENUE_WORDS if entity == "venue" else ARTIST_WORDS)} {id}'
+                row = {
+                    'id': id,
+                    'name': name,
+                    'city': city,
+                    'state': state,
+                    'phone': f'{self.rng.randint(200, 999)}-{self.rng.randint(200, 999)}-{self.rng.randint(1000, 9999)}',
+                    'website': f'https://example.com/{entity}/{id}',
+                    'facebook_link': f'https://www.facebook.com/{entity}{id}',
+                    'image_link': f'https://images.example.com/{entity}/{id}.jpg',
+                    'seeking_description': None,
+                }
+                if entity == 'venue':
+                    row['address'] = f'{self.rng.randint(1, 9999)} Main Street'
+                    row['seeking_talent'] = self.rng.random() < 0.3
+                    row.update(self.place(city, state))
+                else:
+                    row['seeking_venue'] = self.rng.random() < 0.3
+                rows.append(row)
+                links.extend({f'{entity}_id': id, 'genre_id': genre_id}
+                             for genre_id in self.pick_genres(genre_ids, weights))
+            bulk_insert(model.__table__, rows)
+            bulk_insert(link, links)
+            db.session.commit()
+            created.extend(ids)
+            self.report(f'{entity}: {start + size}/{count}')
+        return created
+
+    def shows(self, count, venue_ids, artist_ids, past_years=3, future_days=365):
+        # Popularity is Zipf-like: a few venues and artists carry most shows.
+        venue_weights = list(accumulate(1 / (rank + 1) for rank in range(len(venue_ids))))
+        artist_weights = list(accumulate(1 / (rank + 1) for rank in range(len(artist_ids))))
+        now = datetime.today().replace(minute=0, second=0, microsecond=0)
+        span_hours = past_years * 365 * 24 + future_days * 24
+        start_of_range = now - timedelta(days=past_years * 365)
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            venues = self.rng.choices(venue_ids, cum_weights=venue_weights, k=size)
+            artists = self.rng.choices(artist_ids, cum_weights=artist_weights, k=size)
+            rows = [
+                {
+                    'id': id,
+                    'venue_id': venue_id,
+                    'artist_id': artist_id,
+                    'start_time': start_of_range + timedelta(hours=self.rng.randrange(span_hours)),
+                }
+                for id, venue_id, artist_id in zip(reserve_ids(Show, size), venues, artists)
+            ]
+            bulk_insert(Show.__table__, rows)
+            db.session.commit()
+            self.report(f'show: {start + size}/{count}')
+
+    def run(self, shows, venues=None, artists=None):
+        venues = venues or max(10, shows // 100)
+        artists = artists or max(10, shows // 50)
+        genre_ids, weights = self.genres()
+        venue_ids = self.entities(Venue, venue_genre, venues, genre_ids, weights)
+        artist_ids = self.entities(Artist, artist_genre, artists, genre_ids, weights)
+        self.shows(shows, venue_ids, artist_ids)
+        refresh('venue')
+        refresh('artist')
+        if listings_enabled():
+            refresh_listings()
+        backend = search_backend()
+        backend.rebuild(Venue)
+        backend.rebuild(Artist)
+        record_change('venues', 'artists', 'shows')
+        db.session.commit()
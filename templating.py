@@ -0,0 +1,75 @@
+from flask import Response, current_app, get_template_attribute, stream_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from cache import MemoryCache
+
+# Jinja setup. Compiled templates are kept on disk so a fresh worker loads
+# bytecode instead of compiling every template again, and listing tiles are
+# rendered once per distinct row and then reused from a per-process LRU.
+# Listings can also be streamed (stream_page) from lazy row iterators.
+
+STREAM_BUFFER_SIZE = 16 * 1024
+
+# Fields each tile displays. A tile is cached under its row's values for
+# them, so an edited row (new name, new start time, ...) gets a new key and
+# its old fragment simply ages out.
+TILES = {
+    'show': ('venue_id', 'artist_id', 'start_time', 'artist_name', 'artist_image_link',
+             'venue_name'),
+    'venue': ('id', 'name'),
+    'artist': ('id', 'name'),
+}
+
+
+class FragmentCache:
+
+    def __init__(self, max_entries=20000):
+        self.entries = MemoryCache(max_entries) if max_entries else None
+
+    def render(self, kind, row):
+        key = f'{kind}:{tuple(row[field] for field in TILES[kind])!r}'
+        fragment = self.entries.get(key) if self.entries else None
+        if fragment is None:
+            macro = get_template_attribute('fragments/tiles.html', f'{kind}_tile')
+            fragment = Markup(macro(row))
+            if self.entries:
+                self.entries.set(key, fragment)
+        return fragment
+
+    def clear(self):
+        if self.entries:
+            self.entries.clear()
+
+
+def tile(kind, row):
+    return current_app.extensions['fragments'].render(kind, row)
+
+
+def stream_page(template, **context):
+    # Render template as it iterates its (possibly lazy) context, sending
+    # ~STREAM_BUFFER_SIZE chunks instead of one write per tile.
+    def buffered(parts):
+        buffer = []
+        size = 0
+        for part in parts:
+            buffer.append(part)
+            size += len(part)
+            if size >= STREAM_BUFFER_SIZE:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+        yield ''.join(buffer)
+
+    return Response(buffered(stream_template(template, **context)), mimetype='text/html')
+
+
+def init_templating(app):
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        # Jinja picks a per-user temporary directory when none is configured.
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(
+            app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+        )
+    fragments = FragmentCache(app.config.get('TEMPLATE_FRAGMENT_CACHE_SIZE', 20000))
+    app.extensions['fragments'] = fragments
+    app.add_template_global(tile)
+    return fragments
@@ -0,0 +1,78 @@
+import os
+import shutil
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask_migrate import upgrade
+from app import create_app
+from model import db
+from synthetic import Generator
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+
+# Small enough to build in a second or two, big enough that every page has
+# upcoming and past shows.
+SEED_SHOWS = 400
+
+
+def make_app(path, **config):
+    return create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'TEMPLATE_BYTECODE_CACHE': False,
+    }, **config))
+
+
+def build_database(path, shows):
+    # The schema comes from the migrations, as in production, so the indexes
+    # only they create are there too.
+    app = make_app(path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        Generator(seed=0, report=lambda line: None).run(shows)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def copy_database(source, directory):
+    path = directory / 'fyyur.db'
+    shutil.copy(source, path)
+    return path
+
+
+def pytest_addoption(parser):
+    parser.addoption('--save-bench-baseline', action='store_true',
+                     help='Store the measured bench results as the new baseline.')
+    parser.addoption('--bench-tolerance', type=float, default=2.0,
+                     help='Allowed latency/memory growth over the bench baseline.')
+
+
+@pytest.fixture(scope='session')
+def seeded(tmp_path_factory):
+    path = tmp_path_factory.mktemp('seed') / 'fyyur.db'
+    build_database(path, SEED_SHOWS)
+    return path
+
+
+@pytest.fixture
+def database(seeded, tmp_path):
+    # Every test gets its own copy of the seeded database.
+    return copy_database(seeded, tmp_path)
+
+
+@pytest.fixture
+def app(database):
+    app = make_app(database)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+import pytest
+from model import Show
+
+AVAILABLE = '/api/v1/venues/available'
+
+
+@pytest.fixture
+def booked(app):
+    with app.app_context():
+        show = Show.query.order_by(Show.start_time.desc()).first()
+        return show.venue_id, show.start_time
+
+
+def available_ids(client, query):
+    response = client.get(f'{AVAILABLE}?{query}&limit=100')
+    assert response.status_code == 200
+    return [venue['id'] for venue in response.get_json()['venues']]
+
+
+def test_booked_venues_are_not_available(client, booked):
+    venue_id, start_time = booked
+    assert venue_id not in available_ids(client, f'start={start_time.isoformat()}&duration=60')
+
+
+@pytest.mark.parametrize('duration', ['0', '-5', '1441', '99999999999'])
+def test_duration_out_of_range(client, duration):
+    response = client.get(f'{AVAILABLE}?start=2030-06-01T20:00&duration={duration}')
+    assert response.status_code == 400
+    assert 'duration must be' in response.get_json()['error']
+
+
+def test_start_out_of_range(client):
+    response = client.get(f'{AVAILABLE}?start=9999-12-31T23:00&duration=180')
+    assert response.status_code == 400
+    assert client.get(f'{AVAILABLE}?start=0001-01-01T00:00-05:00').status_code == 400
+
+
+def test_offset_aware_times_are_taken_as_utc(client, booked):
+    venue_id, start_time = booked
+    naive = available_ids(client, f'start={start_time.isoformat()}&duration=60')
+    # The same instant written in UTC-05:00 and in UTC.
+    local = (start_time - timedelta(hours=5)).isoformat()
+    assert available_ids(client, f'start={local}-05:00&duration=60') == naive
+    end = (start_time + timedelta(hours=1)).isoformat()
+    assert available_ids(client, f'start={start_time.isoformat()}%2B00:00&end={end}%2B00:00') == naive
+
+
+def test_end_before_start(client):
+    response = client.get(f'{AVAILABLE}?start=2030-06-01T20:00&end=2030-06-01T19:00')
+    assert response.status_code == 400
@@ -0,0 +1,60 @@
+import os
+import pytest
+from bench import Bench, compare, load_baseline, save_baseline
+from conftest import build_database, copy_database, make_app
+
+# bench.py's results for every route on the seeded test database, uncached:
+# queries, p50/p95 latency and peak memory per request. After an intended
+# change, regenerate with
+#   python -m pytest tests/test_bench.py --save-bench-baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+
+def measure(path):
+    app = make_app(path)
+    with app.app_context():
+        results = Bench(app, iterations=7, warmup=2).run(report=lambda name, result: None)
+    for name, result in results.items():
+        assert result['status'] < 400, f'{name} returned {result["status"]}'
+    return results
+
+
+@pytest.fixture(scope='module')
+def results(seeded, tmp_path_factory):
+    return measure(copy_database(seeded, tmp_path_factory.mktemp('bench')))
+
+
+@pytest.fixture(scope='module')
+def baseline(results, pytestconfig):
+    if pytestconfig.getoption('save_bench_baseline'):
+        save_baseline(BASELINE, results)
+    return load_baseline(BASELINE)
+
+
+def test_query_counts_match_baseline(results, baseline):
+    assert sorted(results) == sorted(baseline)
+    grown = {name: (baseline[name]['queries'], result['queries'])
+             for name, result in results.items() if result['queries'] > baseline[name]['queries']}
+    assert not grown, f'queries per request grew (baseline, now): {grown}'
+
+
+def test_latency_and_memory_match_baseline(results, baseline, seeded, tmp_path_factory, pytestconfig):
+    # Timings vary between runs (commits wait on the disk) and machines; the
+    # tolerance (default 2.0, i.e. three times the baseline, plus a few
+    # milliseconds) catches real regressions only, and a route must regress
+    # in a second run as well. Query counts are the exact gate.
+    tolerance = pytestconfig.getoption('bench_tolerance')
+    regressions = compare(results, baseline, tolerance, noise_ms=5.0)
+    if regressions:
+        again = measure(copy_database(seeded, tmp_path_factory.mktemp('again')))
+        routes = {line.split(':')[0] for line in compare(again, baseline, tolerance, noise_ms=5.0)}
+        regressions = [line for line in regressions if line.split(':')[0] in routes]
+    assert not regressions, '\n'.join(regressions)
+
+
+def test_query_counts_do_not_grow_with_data(results, tmp_path_factory):
+    path = tmp_path_factory.mktemp('large') / 'fyyur.db'
+    build_database(path, 4000)
+    larger = measure(path)
+    assert {name: result['queries'] for name, result in larger.items()} == \
+        {name: result['queries'] for name, result in results.items()}
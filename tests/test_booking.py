@@ -0,0 +1,83 @@
+import re
+from datetime import datetime, timedelta
+from model import Show
+
+
+def show_count(app):
+    with app.app_context():
+        return Show.query.count()
+
+
+def booked_show(app):
+    with app.app_context():
+        show = Show.query.order_by(Show.start_time.desc()).first()
+        return show.venue_id, show.artist_id, show.start_time
+
+
+def test_create_show(app, client):
+    before = show_count(app)
+    venue_id, artist_id, _ = booked_show(app)
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2150-06-01 20:00', 'duration': '90'
+    })
+    assert response.status_code == 200
+    assert b'Show was successfully listed!' in response.data
+    assert show_count(app) == before + 1
+    with app.app_context():
+        show = Show.query.filter_by(start_time=datetime(2150, 6, 1, 20)).one()
+        assert (show.venue_id, show.artist_id, show.duration) == (venue_id, artist_id, 90)
+
+
+def test_double_booking_keeps_the_form(app, client):
+    before = show_count(app)
+    venue_id, artist_id, start_time = booked_show(app)
+    overlapping = (start_time + timedelta(minutes=30)).strftime('%Y-%m-%d %H:%M')
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id, 'start_time': overlapping
+    })
+    body = response.data.decode()
+    assert 'Show could not be listed' in body
+    assert f'value="{overlapping}"' in body
+    assert f'value="{venue_id}"' in body
+    assert body.count(f'Already booked at {start_time:%Y-%m-%d %H:%M}') == 2
+    assert show_count(app) == before
+
+
+def tour(client, artist_id, dates):
+    return client.post('/shows/tour', data={'artist_id': artist_id, 'dates': dates, 'duration': '120'})
+
+
+def test_tour_lists_every_date(app, client):
+    before = show_count(app)
+    venue_id, artist_id, _ = booked_show(app)
+    first = datetime(2160, 1, 1, 20)
+    dates = '\n'.join(f'{venue_id}, {first + timedelta(days=day)}' for day in range(10))
+    response = tour(client, artist_id, dates)
+    assert b'10 shows were successfully listed!' in response.data
+    assert show_count(app) == before + 10
+
+
+def test_tour_with_a_bad_line_lists_nothing(app, client):
+    before = show_count(app)
+    venue_id, artist_id, start_time = booked_show(app)
+    dates = '\n'.join([
+        f'{venue_id}, 2161-01-01 20:00',
+        f'{venue_id}, not a date',
+        f'{venue_id}, {start_time + timedelta(minutes=30)}',
+        f'{venue_id}, 2161-01-02 20:00, 0',
+    ])
+    body = tour(client, artist_id, dates).data.decode()
+    lines = re.findall(r'<li>Line (\d+)', body)
+    assert lines == ['2', '3', '4']
+    assert show_count(app) == before
+
+
+def test_tour_rejects_unknown_artist_and_too_many_dates(app, client):
+    before = show_count(app)
+    venue_id, artist_id, _ = booked_show(app)
+    assert b'Tour could not be listed' in tour(client, 999999, f'{venue_id}, 2162-01-01 20:00').data
+    max_dates = app.config['TOUR_MAX_DATES']
+    first = datetime(2163, 1, 1, 20)
+    dates = '\n'.join(f'{venue_id}, {first + timedelta(days=day)}' for day in range(max_dates + 1))
+    assert f'A tour can list at most {max_dates}'.encode() in tour(client, artist_id, dates).data
+    assert show_count(app) == before
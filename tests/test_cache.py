@@ -0,0 +1,52 @@
+import pytest
+from conftest import make_app
+from model import Venue
+
+VENUE_FORM = {'city': 'Austin', 'state': 'TX', 'address': '1 Test St', 'phone': '512-555-0100',
+              'genres': ['Jazz']}
+
+
+@pytest.fixture
+def other_worker(database):
+    # A second app on the same database stands in for another worker, with
+    # its own in-process cache.
+    return make_app(database)
+
+
+def venue_id(app):
+    with app.app_context():
+        return Venue.query.order_by(Venue.id).first().id
+
+
+def test_edits_are_seen_by_other_workers(app, client, other_worker):
+    id = venue_id(app)
+    other = other_worker.test_client()
+    for path in (f'/venues/{id}', '/venues', f'/api/v1/venues/{id}'):
+        other.get(path)
+    etag = other.get(f'/api/v1/venues/{id}').headers['ETag']
+
+    client.post(f'/venues/{id}/edit', data=dict(VENUE_FORM, name='Renamed Venue'))
+
+    assert b'Renamed Venue' in other.get(f'/venues/{id}').data
+    assert b'Renamed Venue' in other.get('/venues').data
+    response = other.get(f'/api/v1/venues/{id}')
+    assert response.get_json()['name'] == 'Renamed Venue'
+    assert response.headers['ETag'] != etag
+    assert client.get(f'/api/v1/venues/{id}').headers['ETag'] == response.headers['ETag']
+
+
+def test_pages_are_cached_until_a_change(app, client):
+    id = venue_id(app)
+    client.get(f'/venues/{id}')
+    hits = client.get('/cache/stats').get_json()['hits']
+    client.get(f'/venues/{id}')
+    assert client.get('/cache/stats').get_json()['hits'] > hits
+
+    client.post(f'/venues/{id}/edit', data=dict(VENUE_FORM, name='Changed Again'))
+    assert b'Changed Again' in client.get(f'/venues/{id}').data
+
+
+def test_api_revalidates_with_etag(client, app):
+    id = venue_id(app)
+    etag = client.get(f'/api/v1/venues/{id}').headers['ETag']
+    assert client.get(f'/api/v1/venues/{id}', headers={'If-None-Match': etag}).status_code == 304
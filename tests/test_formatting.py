@@ -0,0 +1,28 @@
+from datetime import datetime
+from babel.dates import format_datetime
+from formatting import FORMATS, DateFormatter
+
+START = datetime(2030, 6, 1, 20, 30)
+
+
+def test_formats_match_babel():
+    formatter = DateFormatter()
+    for name, pattern in FORMATS.items():
+        assert formatter(START, name) == format_datetime(START, pattern, locale='en_US')
+    assert formatter(START, 'short') == format_datetime(START, 'short', locale='en_US')
+    assert formatter(START) == 'Sat 06, 01, 2030 8:30PM'
+
+
+def test_strings_and_none():
+    formatter = DateFormatter()
+    assert formatter('2030-06-01 20:30:00') == formatter(START)
+    assert formatter(None) == ''
+
+
+def test_timezone_converts_from_utc():
+    assert DateFormatter(timezone='America/Chicago')(START, 'HH:mm') == '15:30'
+
+
+def test_json_keeps_start_times(app):
+    with app.app_context():
+        assert app.json.dumps({'start_time': START}) == '{"start_time": "2030-06-01 20:30:00"}'
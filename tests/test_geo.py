@@ -0,0 +1,47 @@
+import random
+import pytest
+from geo import distance_km, geohash, venues_near
+from model import db, Venue
+
+
+@pytest.fixture
+def placed(app):
+    with app.app_context():
+        yield [(id, latitude, longitude) for id, latitude, longitude in db.session.query(
+            Venue.id, Venue.latitude, Venue.longitude).filter(Venue.latitude.isnot(None))]
+
+
+def test_near_matches_brute_force(app, placed):
+    rng = random.Random(1)
+    assert placed
+    with app.app_context():
+        for _ in range(60):
+            _, latitude, longitude = rng.choice(placed)
+            latitude += rng.uniform(-0.1, 0.1)
+            longitude += rng.uniform(-0.1, 0.1)
+            radius = rng.choice([1, 5, 25, 100, 500])
+            limit = rng.choice([1, 5, 20])
+            expected = sorted((distance_km(latitude, longitude, lat, lon), id)
+                              for id, lat, lon in placed
+                              if distance_km(latitude, longitude, lat, lon) <= radius)[:limit]
+            found = venues_near(latitude, longitude, radius, limit)
+            assert [venue['id'] for venue in found] == [id for _, id in expected]
+
+
+def test_near_across_the_antimeridian(app):
+    with app.app_context():
+        venue = Venue.query.first()
+        venue.latitude, venue.longitude, venue.geohash = 10.0, 179.99, geohash(10.0, 179.99)
+        db.session.commit()
+        found = venues_near(10.0, -179.99, 10, 5)
+        assert venue.id in [row['id'] for row in found]
+
+
+def test_near_routes(client, placed):
+    _, latitude, longitude = placed[0]
+    response = client.get(f'/api/v1/venues/near?lat={latitude}&lon={longitude}&radius=50')
+    assert response.status_code == 200
+    distances = [venue['distance_km'] for venue in response.get_json()['venues']]
+    assert distances and distances == sorted(distances) and distances[-1] <= 50
+    assert client.get('/api/v1/venues/near?lat=91&lon=0').status_code == 400
+    assert client.get(f'/venues/near?lat={latitude}&lon={longitude}').status_code == 200
@@ -0,0 +1,106 @@
+import json
+import pytest
+import importer
+from model import Artist, Show, Venue
+
+VENUES = 10
+CHUNK = '3'
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    venues = [{'id': f'v{i}', 'name': f'Imported Hall {i}', 'city': 'Austin', 'state': 'TX',
+               'address': f'{i} Congress Ave', 'genres': 'Jazz,Blues',
+               'facebook_link': 'https://www.facebook.com/hall', 'website': 'https://example.com'}
+              for i in range(VENUES)]
+    artists = [{'id': 'a0', 'name': 'Imported Band', 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz'],
+                'facebook_link': 'https://www.facebook.com/band', 'website': 'https://example.com'}]
+    shows = [{'venue_id': f'v{i}', 'artist_id': 'a0', 'start_time': f'2180-01-{i + 1:02d} 20:00:00'}
+             for i in range(VENUES)]
+    return {
+        '--venues': write_jsonl(tmp_path / 'venues.jsonl', venues),
+        '--artists': write_jsonl(tmp_path / 'artists.jsonl', artists),
+        '--shows': write_jsonl(tmp_path / 'shows.jsonl', shows),
+        '--state': str(tmp_path / 'import-state.json'),
+    }
+
+
+def run_import(app, files):
+    args = ['import', '--chunk-size', CHUNK]
+    for option, value in files.items():
+        args += [option, value]
+    return app.test_cli_runner().invoke(args=args)
+
+
+def imported(app):
+    with app.app_context():
+        venues = sorted(name for name, in Venue.query.filter(Venue.name.like('Imported Hall %')).
+                        with_entities(Venue.name))
+        artists = Artist.query.filter_by(name='Imported Band').count()
+        shows = Show.query.join(Venue).filter(Venue.name.like('Imported Hall %')).count()
+        return venues, artists, shows
+
+
+def expect_complete(app):
+    venues, artists, shows = imported(app)
+    assert venues == sorted(f'Imported Hall {i}' for i in range(VENUES))
+    assert (artists, shows) == (1, VENUES)
+
+
+def test_import(app, files):
+    result = run_import(app, files)
+    assert result.exit_code == 0, result.output
+    assert '0 rows rejected' in result.output
+    expect_complete(app)
+    with app.app_context():
+        assert {genre.name for genre in Venue.query.filter_by(name='Imported Hall 0').one().genres} == \
+            {'Jazz', 'Blues'}
+
+
+def test_resume_after_a_failed_chunk(app, files, monkeypatch):
+    insert = importer.bulk_insert
+
+    def failing(table, rows):
+        if table.name == 'venue' and any(row['name'] == 'Imported Hall 7' for row in rows):
+            raise RuntimeError('connection lost')
+        insert(table, rows)
+
+    monkeypatch.setattr(importer, 'bulk_insert', failing)
+    assert isinstance(run_import(app, files).exception, RuntimeError)
+    assert len(imported(app)[0]) == 6
+    with open(files['--state']) as f:
+        assert json.load(f)['done'] == {'venue': 6}
+
+    monkeypatch.setattr(importer, 'bulk_insert', insert)
+    assert run_import(app, files).exit_code == 0
+    expect_complete(app)
+
+
+def test_resume_after_a_commit_the_state_file_missed(app, files, monkeypatch):
+    # The chunk's rows committed but the process died before recording it;
+    # the rerun must find them and not insert them again.
+    commit = importer.ImportState.commit
+    calls = []
+
+    def crash_on_second(state):
+        calls.append(state.data['pending'])
+        if len(calls) == 2:
+            raise RuntimeError('killed')
+        commit(state)
+
+    monkeypatch.setattr(importer.ImportState, 'commit', crash_on_second)
+    assert isinstance(run_import(app, files).exception, RuntimeError)
+    assert len(imported(app)[0]) == 6
+    with open(files['--state']) as f:
+        assert json.load(f)['pending']['rows'] == 3
+
+    monkeypatch.setattr(importer.ImportState, 'commit', commit)
+    assert run_import(app, files).exit_code == 0
+    expect_complete(app)
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import select
+from cache import get_cache
+from listing import listing_rows
+from model import db, Show, ShowListing
+
+PAGES = ['/shows', '/shows?scope=all', '/shows?stream=1&scope=all', '/api/v1/shows?scope=all',
+         '/export/shows.jsonl']
+
+
+@pytest.fixture
+def listed(app):
+    app.config['SHOW_LISTING_TABLE'] = True
+    result = app.test_cli_runner().invoke(args=['rebuild-listings'])
+    assert result.exit_code == 0
+    return app
+
+
+def consistent(app):
+    with app.app_context():
+        joined = sorted(tuple(row) for row in db.session.execute(listing_rows()))
+        copied = sorted(tuple(row) for row in db.session.execute(select(*ShowListing.__table__.c)))
+        return joined == copied
+
+
+def pages(app, client, ids):
+    with app.app_context():
+        get_cache().backend.clear()
+    app.extensions['fragments'].clear()
+    paths = PAGES + [f'/venues/{ids[0]}', f'/artists/{ids[1]}']
+    return {path: client.get(path).data for path in paths}
+
+
+def test_listings_follow_writes(listed, client):
+    with listed.app_context():
+        show = Show.query.order_by(Show.id).first()
+        ids = (show.venue_id, show.artist_id)
+    assert consistent(listed)
+    client.post(f'/artists/{ids[1]}/edit', data={
+        'name': 'Renamed Artist', 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz'],
+        'image_link': 'https://images.example.com/new.jpg', 'phone': '512-555-0101'
+    })
+    assert consistent(listed)
+    client.post('/shows/create', data={'venue_id': ids[0], 'artist_id': ids[1],
+                                       'start_time': '2170-01-01 20:00'})
+    assert consistent(listed)
+    with listed.app_context():
+        other = Show.query.filter(Show.venue_id != ids[0]).first().venue_id
+    client.post(f'/venues/{other}/delete')
+    assert consistent(listed)
+    assert b'Renamed Artist' in client.get('/shows?scope=all').data
+
+
+def test_listings_render_the_same_pages(listed, client):
+    with listed.app_context():
+        show = Show.query.order_by(Show.id).first()
+        ids = (show.venue_id, show.artist_id)
+    on = pages(listed, client, ids)
+    listed.config['SHOW_LISTING_TABLE'] = False
+    assert pages(listed, client, ids) == on
@@ -0,0 +1,28 @@
+import pytest
+from bench import Bench, READ_ROUTES, fill
+
+
+@pytest.fixture
+def ids(app):
+    with app.app_context():
+        return Bench.ids()
+
+
+@pytest.mark.parametrize('name, method, path, data', READ_ROUTES, ids=[route[0] for route in READ_ROUTES])
+def test_read_routes(client, ids, name, method, path, data):
+    response = client.open(fill(path, ids), method=method, data=fill(data, ids))
+    assert response.status_code == 200
+
+
+def test_error_log_handler_is_attached_once(database, tmp_path, monkeypatch):
+    from logging import FileHandler
+    from conftest import make_app
+    monkeypatch.chdir(tmp_path)
+    apps = [make_app(database, TESTING=False, SECRET_KEY='x') for _ in range(3)]
+    try:
+        handlers = [handler for handler in apps[0].logger.handlers if isinstance(handler, FileHandler)]
+        assert len(handlers) == 1
+    finally:
+        for handler in handlers:
+            apps[0].logger.removeHandler(handler)
+            handler.close()
@@ -0,0 +1,37 @@
+import re
+from types import SimpleNamespace
+from flask import g
+from profiling import after_cursor_execute
+
+
+def metric(client, name, endpoint):
+    body = client.get('/metrics').data.decode()
+    match = re.search(rf'^{name}{{endpoint="{endpoint}"}} (\S+)$', body, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_streamed_pages_are_recorded_on_close(app, client):
+    response = client.get('/shows?stream=1&scope=all')
+    # Only look at the counters directly here: another request from this
+    # thread would share the streaming request's app context.
+    assert 'main.shows' not in app.extensions['metrics'].counters
+    response.get_data()
+    response.close()
+    assert metric(client, 'fyyur_requests_total', 'main.shows') == 1
+    assert metric(client, 'fyyur_sql_queries_total', 'main.shows') > 0
+    assert metric(client, 'fyyur_template_seconds_total', 'main.shows') > 0
+
+
+def test_rows_count_reported_query_results_only(app):
+    def execute(description, rowcount):
+        cursor = SimpleNamespace(description=description, rowcount=rowcount)
+        conn = SimpleNamespace(info={'query_start': [0.0]})
+        after_cursor_execute(conn, cursor, 'SELECT 1', (), None, False)
+
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        execute([('id',)], 12)   # psycopg2 SELECT
+        execute([('id',)], -1)   # sqlite3 SELECT
+        execute(None, 3)         # UPDATE
+        assert g.profile['sql_rows'] == 12
+        assert g.profile['sql_queries'] == 3
@@ -0,0 +1,47 @@
+import shutil
+import pytest
+from conftest import make_app
+from model import db, Venue
+
+VENUE_FORM = {'city': 'Austin', 'state': 'TX', 'address': '1 Test St', 'genres': ['Jazz']}
+
+
+@pytest.fixture
+def replicated(database, tmp_path):
+    # The replica is a copy of the primary that no write ever reaches, so
+    # any read routed to it sees the data as it was before the test.
+    replica = tmp_path / 'replica.db'
+    shutil.copy(database, replica)
+    return make_app(database, SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{replica}'])
+
+
+def first_venue(app):
+    with app.app_context():
+        venue = Venue.query.order_by(Venue.id).first()
+        return venue.id, venue.name
+
+
+def test_reads_go_to_the_replica(replicated):
+    id, name = first_venue(replicated)
+    writer = replicated.test_client()
+    writer.post(f'/venues/{id}/edit', data=dict(VENUE_FORM, name='Written To Primary'))
+
+    with replicated.app_context():
+        assert db.session.get(Venue, id).name == 'Written To Primary'
+    # A new client has no write to read back, so it reads the replica.
+    reader = replicated.test_client()
+    assert reader.get(f'/api/v1/venues/{id}').get_json()['name'] == name
+
+
+def test_writer_reads_its_own_writes(replicated):
+    id, _ = first_venue(replicated)
+    writer = replicated.test_client()
+    writer.post(f'/venues/{id}/edit', data=dict(VENUE_FORM, name='Written To Primary'))
+    assert writer.get(f'/api/v1/venues/{id}').get_json()['name'] == 'Written To Primary'
+    assert b'Written To Primary' in writer.get(f'/venues/{id}').data
+
+
+def test_without_replicas_reads_use_the_primary(app, client):
+    id, _ = first_venue(app)
+    client.post(f'/venues/{id}/edit', data=dict(VENUE_FORM, name='Written To Primary'))
+    assert app.test_client().get(f'/api/v1/venues/{id}').get_json()['name'] == 'Written To Primary'
@@ -0,0 +1,36 @@
+import pytest
+from conftest import make_app
+
+VENUE_FORM = {'city': 'Austin', 'state': 'TX', 'address': '1 Congress Ave', 'genres': ['Jazz']}
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def backend(request):
+    return request.param
+
+
+def found(client, path, term, name):
+    return name.encode() in client.post(path, data={'search_term': term}).data
+
+
+def test_search_finds_new_and_renamed_venues(database, backend):
+    app = make_app(database, SEARCH_BACKEND=backend)
+    client = app.test_client()
+    client.post('/venues/create', data=dict(VENUE_FORM, name='Zanzibar Ballroom'))
+    assert found(client, '/venues/search', 'Zanzibar', 'Zanzibar Ballroom')
+    assert found(client, '/venues/search', 'zanz', 'Zanzibar Ballroom')
+
+
+def test_memory_index_follows_other_workers(database):
+    # Two apps on one database stand in for two workers, each with its own
+    # in-memory index.
+    writer = make_app(database, SEARCH_BACKEND='memory').test_client()
+    reader = make_app(database, SEARCH_BACKEND='memory').test_client()
+    assert not found(reader, '/venues/search', 'Zanzibar', 'Zanzibar Ballroom')
+
+    writer.post('/venues/create', data=dict(VENUE_FORM, name='Zanzibar Ballroom'))
+    assert found(reader, '/venues/search', 'Zanzibar', 'Zanzibar Ballroom')
+
+    writer.post('/artists/create', data={'name': 'Quixotic Quartet', 'city': 'Austin', 'state': 'TX',
+                                         'genres': ['Jazz']})
+    assert found(reader, '/artists/search', 'quix', 'Quixotic Quartet')
@@ -0,0 +1,91 @@
+import pytest
+from cache import record_change
+from geo import position, venues_near
+from model import db, Artist, Genre, Venue
+
+
+@pytest.fixture
+def venue(app):
+    with app.app_context():
+        venue = Venue.query.filter(Venue.latitude.isnot(None)).order_by(Venue.id).first()
+        return {'id': venue.id, 'name': venue.name, 'city': venue.city, 'state': venue.state,
+                'address': venue.address, 'phone': venue.phone, 'genres': ['Jazz'],
+                'point': (venue.latitude, venue.longitude, venue.geohash)}
+
+
+def point(app, id):
+    with app.app_context():
+        venue = db.session.get(Venue, id)
+        return venue.latitude, venue.longitude, venue.geohash
+
+
+def edit(client, venue, **changes):
+    data = {key: value for key, value in venue.items() if key not in ('id', 'point')}
+    return client.post(f'/venues/{venue["id"]}/edit', data=dict(data, **changes))
+
+
+def test_create_venue_is_placed(app, client):
+    client.post('/venues/create', data={'name': 'Placed Hall', 'city': 'Austin', 'state': 'TX',
+                                        'address': '1 Congress Ave', 'phone': '512-555-0100',
+                                        'genres': ['Jazz']})
+    with app.app_context():
+        venue = Venue.query.filter_by(name='Placed Hall').one()
+        assert venue.latitude == pytest.approx(30.27, abs=0.1)
+        assert venue.longitude == pytest.approx(-97.74, abs=0.1)
+
+
+def test_edit_keeps_coordinates(app, client, venue):
+    edit(client, venue, name='New Name')
+    assert point(app, venue['id']) == venue['point']
+
+
+def test_edit_to_an_unknown_place_clears_coordinates(app, client, venue):
+    edit(client, venue, city='Nowhere', state='ZZ')
+    assert point(app, venue['id']) == (None, None, None)
+    latitude, longitude, _ = venue['point']
+    with app.app_context():
+        assert venue['id'] not in [row['id'] for row in venues_near(latitude, longitude, 1, 100)]
+
+
+def test_geocode_command_refreshes_the_venue_resource(app, client, venue):
+    with app.app_context():
+        db.session.query(Venue).filter_by(id=venue['id']).update(position(None, None))
+        record_change(f'venue:{venue["id"]}')
+        db.session.commit()
+    path = f'/api/v1/venues/{venue["id"]}'
+    response = client.get(path)
+    assert response.get_json()['latitude'] is None
+    result = app.test_cli_runner().invoke(args=['geocode'])
+    assert result.output.startswith('1 venues placed')
+    response = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()['latitude'] is not None
+
+
+def test_edit_that_moves_the_venue_places_it_again(app, client, venue):
+    city, state = ('Austin', 'TX') if venue['city'] != 'Austin' else ('Chicago', 'IL')
+    edit(client, venue, city=city, state=state)
+    assert point(app, venue['id']) != venue['point']
+
+
+def test_delete_venue(app, client, venue):
+    client.post(f'/venues/{venue["id"]}/delete')
+    with app.app_context():
+        assert db.session.get(Venue, venue['id']) is None
+    assert f'Venue id {venue["id"]} not found!'.encode() in client.get(f'/venues/{venue["id"]}').data
+    assert venue['name'].encode() not in client.get('/venues').data
+
+
+def test_unknown_genres_are_rejected(app, client, venue):
+    with app.app_context():
+        genres = Genre.query.count()
+    response = client.post('/venues/create', data={'name': 'Made Up Hall', 'city': 'Austin', 'state': 'TX',
+                                                   'address': '1 Congress Ave', 'genres': ['Jazz', 'Zydecore']})
+    assert b'could not be listed: unknown genre' in response.data
+    client.post('/artists/create', data={'name': 'Made Up Band', 'city': 'Austin', 'state': 'TX',
+                                         'genres': ['Zydecore']})
+    edit(client, venue, name='Made Up Name', genres=['Zydecore'])
+    with app.app_context():
+        assert Genre.query.count() == genres
+        assert not Venue.query.filter(Venue.name.in_(['Made Up Hall', 'Made Up Name'])).count()
+        assert not Artist.query.filter_by(name='Made Up Band').count()